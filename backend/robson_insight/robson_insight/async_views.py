@@ -0,0 +1,50 @@
+"""
+Base class for the async read endpoints served under ``async/``.
+
+DRF views are synchronous, so these are plain Django views with async
+handlers. They accept the same ``Authorization: Token <key>`` header as the
+REST API and answer with the same JSON bodies, letting one ASGI worker keep
+many dashboard polls in flight while it waits on the database.
+"""
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse
+from django.views import View
+from rest_framework.authtoken.models import Token
+
+
+async def aauthenticate(request):
+    """The active user for the request's token, or None."""
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0].lower() != 'token':
+        return None
+    try:
+        token = await Token.objects.select_related('user').aget(key=parts[1])
+    except Token.DoesNotExist:
+        return None
+    if not token.user.is_active:
+        return None
+    return token.user
+
+
+class AsyncTokenView(View):
+    """
+    Authenticates the request, then dispatches to the subclass's async method
+    handler (``get``) as ``View`` does. Errors are reported the way DRF
+    reports them so clients can switch between the two freely.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await aauthenticate(request)
+        if user is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=401,
+                headers={'WWW-Authenticate': 'Token'},
+            )
+        request.user = user
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except PermissionDenied as e:
+            return JsonResponse({'detail': str(e) or 'You do not have permission to perform this action.'}, status=403)
+        except Http404:
+            return JsonResponse({'detail': 'Not found.'}, status=404)
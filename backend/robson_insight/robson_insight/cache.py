@@ -0,0 +1,89 @@
+"""
+Version counters for cached membership maps and summaries.
+
+Cached values are stored under keys that include the version of every
+user, group or filter they depend on. Signals bump those versions when the
+underlying rows change, so stale entries are simply never read again and
+expire on their own.
+
+A bump only reaches other processes through a cache they share, so the
+default backend is file-based; deployments spread over several hosts should
+point ``CACHES`` at a shared server such as Redis or Memcached.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+CACHE_TIMEOUT = getattr(settings, 'ROBSON_CACHE_TIMEOUT', 3600)
+
+
+def _version_key(kind, pk):
+    return f'version:{kind}:{pk}'
+
+
+def _fresh_version():
+    # A counter that was evicted restarts above any value it could have had,
+    # so keys built from the old value are never reused.
+    return time.time_ns() // 1000
+
+
+def get_versions(kind, pks):
+    """``{pk: version}`` for several objects in one cache round-trip."""
+    keys = {_version_key(kind, pk): pk for pk in pks}
+    found = cache.get_many(keys)
+    missing = {key: _fresh_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def get_version(kind, pk):
+    return get_versions(kind, [pk])[pk]
+
+
+async def aget_versions(kind, pks):
+    keys = {_version_key(kind, pk): pk for pk in pks}
+    found = await cache.aget_many(keys)
+    missing = {key: _fresh_version() for key in keys if key not in found}
+    if missing:
+        await cache.aset_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+async def aget_version(kind, pk):
+    return (await aget_versions(kind, [pk]))[pk]
+
+
+def _incr_versions(kind, pks):
+    for pk in pks:
+        key = _version_key(kind, pk)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), timeout=None)
+
+
+def bump_versions(kind, pks):
+    """
+    Invalidate what is cached for ``pks``, now and again once the current
+    transaction commits: a concurrent request may read the pre-commit rows
+    in between and cache them under the intermediate version.
+    """
+    pks = set(pks)
+    _incr_versions(kind, pks)
+    transaction.on_commit(lambda: _incr_versions(kind, pks))
+
+
+def bump_version(kind, pk):
+    bump_versions(kind, [pk])
+
+
+def make_key(prefix, *parts):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'{prefix}:{digest}'
@@ -0,0 +1,226 @@
+"""
+Per-request instrumentation.
+
+``MetricsMiddleware`` records, for a sample of requests, the view name, the
+number of SQL queries and the time spent in them, the time spent rendering
+the response and its size. Each sampled response gets a ``Server-Timing``
+header, and the totals are served in Prometheus text format by
+``metrics_view`` at ``/metrics`` to clients in ``ROBSON_METRICS_ALLOWED_IPS``.
+
+``ROBSON_METRICS_SAMPLE_RATE`` is the fraction of requests measured; the
+others only pay for one ``random()`` call. The async views run their
+queries on a worker thread shared with other requests, so only their
+timings and size are recorded, not their queries.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS_PATH = '/metrics'
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = {}
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+    """Totals per ``(view, method)``, kept in process memory."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, sample):
+        key = (sample.view, sample.method)
+        with self.lock:
+            stats = self.views.get(key)
+            if stats is None:
+                stats = self.views[key] = ViewStats()
+            stats.requests[sample.status] = stats.requests.get(sample.status, 0) + 1
+            stats.duration.observe(sample.total)
+            if sample.queries is not None:
+                stats.queries.observe(sample.queries)
+                stats.db_seconds += sample.db_time
+            stats.render_seconds += sample.render_time
+            stats.response_bytes += sample.size or 0
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def render(self):
+        lines = [
+            '# HELP robson_requests_total Sampled requests by view, method and status.',
+            '# TYPE robson_requests_total counter',
+        ]
+        histograms = {
+            'robson_request_duration_seconds': ('Time from the first middleware to the response.', []),
+            'robson_db_queries': ('SQL queries per request.', []),
+        }
+        counters = {
+            'robson_db_seconds_total': ('Time spent in SQL queries.', []),
+            'robson_render_seconds_total': ('Time spent rendering responses.', []),
+            'robson_response_bytes_total': ('Size of non-streaming response bodies.', []),
+        }
+        with self.lock:
+            for (view, method), stats in sorted(self.views.items()):
+                labels = f'view="{view}",method="{method}"'
+                for status, count in sorted(stats.requests.items()):
+                    lines.append(f'robson_requests_total{{{labels},status="{status}"}} {count}')
+                histograms['robson_request_duration_seconds'][1].extend(
+                    stats.duration.lines('robson_request_duration_seconds', labels))
+                histograms['robson_db_queries'][1].extend(stats.queries.lines('robson_db_queries', labels))
+                counters['robson_db_seconds_total'][1].append(
+                    f'robson_db_seconds_total{{{labels}}} {stats.db_seconds:.6f}')
+                counters['robson_render_seconds_total'][1].append(
+                    f'robson_render_seconds_total{{{labels}}} {stats.render_seconds:.6f}')
+                counters['robson_response_bytes_total'][1].append(
+                    f'robson_response_bytes_total{{{labels}}} {stats.response_bytes}')
+
+        for kind, metrics in (('histogram', histograms), ('counter', counters)):
+            for name, (description, samples) in metrics.items():
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}', *samples]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestSample:
+    def __init__(self, request):
+        self.started = time.perf_counter()
+        self.method = request.method
+        self.view = 'unresolved'
+        self.status = None
+        self.queries = None
+        self.db_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+        self.total = 0.0
+        self.size = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def rendered(self, response):
+        if self.render_started is not None:
+            self.render_time = time.perf_counter() - self.render_started
+
+    def finish(self, request, response):
+        self.total = time.perf_counter() - self.started
+        self.status = response.status_code
+        if request.resolver_match is not None:
+            self.view = request.resolver_match.view_name
+        if not response.streaming:
+            self.size = len(response.content)
+
+    def server_timing(self):
+        parts = []
+        if self.queries is not None:
+            parts.append(f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"')
+        parts.append(f'render;dur={self.render_time * 1000:.1f}')
+        parts.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled(request):
+            return self.get_response(request)
+
+        sample = request._metrics_sample = RequestSample(request)
+        sample.queries = 0
+        with ExitStack() as stack:
+            # Wrappers are lazy, so this doesn't open connections the request won't use
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(sample))
+            response = self.get_response(request)
+        return self.finish(request, response, sample)
+
+    async def __acall__(self, request):
+        if not self.sampled(request):
+            return await self.get_response(request)
+        sample = request._metrics_sample = RequestSample(request)
+        response = await self.get_response(request)
+        return self.finish(request, response, sample)
+
+    def sampled(self, request):
+        if request.path == METRICS_PATH:
+            return False
+        rate = getattr(settings, 'ROBSON_METRICS_SAMPLE_RATE', 1.0)
+        return rate >= 1 or random.random() < rate
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, right after this hook
+        sample = getattr(request, '_metrics_sample', None)
+        if sample is not None:
+            sample.render_started = time.perf_counter()
+            response.add_post_render_callback(sample.rendered)
+        return response
+
+    def finish(self, request, response, sample):
+        sample.finish(request, response)
+        response['Server-Timing'] = sample.server_timing()
+        registry.record(sample)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition of ``registry``, for local scrapers only."""
+    allowed = getattr(settings, 'ROBSON_METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,203 @@
+"""
+Query diagnostics for development, staging and tests.
+
+``QueryDiagnosticsMiddleware`` captures every SQL statement a request runs,
+together with the line of project code that issued it. It reports:
+
+- repeated queries: ``ROBSON_REPEATED_QUERY_THRESHOLD`` or more statements
+  with the same structure from the same line, the signature of an N+1 loop
+  such as ``entry.groups.all()`` inside a loop over entries;
+- slow queries: statements taking ``ROBSON_SLOW_QUERY_MS`` or longer.
+
+``ROBSON_QUERY_DIAGNOSTICS`` picks the mode: ``"off"`` removes the
+middleware, ``"log"`` writes warnings to the ``robson_insight.querylog``
+logger, and ``"raise"`` also raises ``RepeatedQueries`` for an N+1, which
+fails the test that made the request.
+
+Code that repeats a statement on purpose, like the per-key rollup updates,
+runs it inside ``allow_repeated_queries()``.
+
+Under ASGI the async views run their queries on a worker thread shared with
+other requests, so the middleware passes them through unexamined rather
+than force every async request through a sync adapter.
+"""
+import logging
+import re
+import time
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+THIS_FILE = str(Path(__file__).resolve())
+
+_repeats_allowed = ContextVar('repeats_allowed', default=False)
+
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+class RepeatedQueries(AssertionError):
+    pass
+
+
+@contextmanager
+def allow_repeated_queries():
+    """Don't report statements run inside this block as repeated."""
+    token = _repeats_allowed.set(True)
+    try:
+        yield
+    finally:
+        _repeats_allowed.reset(token)
+
+
+def fingerprint(sql):
+    """``sql`` with literals and the length of IN lists removed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def project_stack():
+    """The frames of project code (not Django or this module) calling into the database, innermost last."""
+    frames = traceback.StackSummary.extract(traceback.walk_stack(None), lookup_lines=False)
+    return [
+        frame for frame in reversed(frames)
+        if frame.filename.startswith(PROJECT_ROOT)
+        and frame.filename != THIS_FILE
+        and 'site-packages' not in frame.filename
+    ]
+
+
+def describe(frame):
+    return f'{Path(frame.filename).relative_to(PROJECT_ROOT)}:{frame.lineno} in {frame.name}'
+
+
+class QueryInspector:
+    """``connection.execute_wrapper`` that records each statement with its origin and duration."""
+
+    def __init__(self, slow_ms=None):
+        self.slow_ms = slow_ms
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            stack = project_stack()
+            self.queries.append({
+                'sql': sql,
+                'duration_ms': duration,
+                'stack': stack,
+                'origin': stack[-1] if stack else None,
+                'repeat_allowed': _repeats_allowed.get(),
+            })
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeated(self, threshold):
+        """``[(count, origin, sql)]`` for statements repeated ``threshold`` or more times from one line."""
+        groups = defaultdict(list)
+        for query in self.queries:
+            if query['repeat_allowed'] or query['origin'] is None:
+                continue
+            origin = query['origin']
+            groups[(fingerprint(query['sql']), origin.filename, origin.lineno)].append(query)
+        return [
+            (len(queries), queries[0]['origin'], queries[0]['sql'])
+            for queries in groups.values()
+            if len(queries) >= threshold
+        ]
+
+    def slow(self):
+        if self.slow_ms is None:
+            return []
+        return [query for query in self.queries if query['duration_ms'] >= self.slow_ms]
+
+
+@contextmanager
+def capture_queries(slow_ms=None):
+    """Record the statements run inside the block, for tests and the shell."""
+    inspector = QueryInspector(slow_ms)
+    with inspector.capture():
+        yield inspector
+
+
+def repeated_query_report(view, repeated):
+    lines = [f'Repeated queries in {view}:']
+    for count, origin, sql in repeated:
+        lines.append(f'  {count}x from {describe(origin)}: {sql}')
+    return '\n'.join(lines)
+
+
+class QueryDiagnosticsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'ROBSON_QUERY_DIAGNOSTICS', 'off')
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        self.threshold = getattr(settings, 'ROBSON_REPEATED_QUERY_THRESHOLD', 5)
+        self.slow_ms = getattr(settings, 'ROBSON_SLOW_QUERY_MS', 100)
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        inspector = QueryInspector(self.slow_ms)
+        with inspector.capture():
+            response = self.get_response(request)
+            if response.streaming:
+                # Streamed bodies run their queries as the response is sent
+                response.streaming_content = self.consume(response.streaming_content, request, inspector)
+                return response
+        self.report(request, inspector)
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def consume(self, content, request, inspector):
+        with inspector.capture():
+            yield from content
+        self.report(request, inspector)
+
+    def report(self, request, inspector):
+        match = request.resolver_match
+        view = match._func_path if match else request.path
+
+        for query in inspector.slow():
+            logger.warning(
+                'Slow query (%.1f ms) in %s:\n%s\n%s',
+                query['duration_ms'], view, query['sql'],
+                ''.join(traceback.format_list(query['stack'])),
+            )
+
+        repeated = inspector.repeated(self.threshold)
+        if repeated:
+            report = repeated_query_report(view, repeated)
+            logger.warning(report)
+            if self.mode == 'raise':
+                raise RepeatedQueries(report)
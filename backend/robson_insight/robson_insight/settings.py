@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "robson_insight.metrics.MetricsMiddleware",
+    "robson_insight.querylog.QueryDiagnosticsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -67,6 +69,36 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Shared by every worker on the host, so version bumps in one are seen by all
+# (see robson_insight/cache.py). Use Redis or Memcached across several hosts.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+TEST_RUNNER = "robson_insight.test_runner.RobsonTestRunner"
+
+# Days sync tombstones are kept; clients that last synced earlier resync in full
+ROBSON_SYNC_TOMBSTONE_DAYS = 90
+
+# Seconds cached membership maps and summaries are kept
+ROBSON_CACHE_TIMEOUT = 3600
+
+# Fraction of requests measured by MetricsMiddleware, and who may read /metrics
+ROBSON_METRICS_SAMPLE_RATE = 1.0
+ROBSON_METRICS_ALLOWED_IPS = ("127.0.0.1", "::1")
+
+# Store each uploaded sheet cell as one Entry weighted by its count
+ROBSON_WEIGHTED_UPLOADS = True
+
+# "off", "log" (warn about N+1 and slow queries) or "raise" (also fail the request on an N+1)
+ROBSON_QUERY_DIAGNOSTICS = "log" if DEBUG else "off"
+ROBSON_REPEATED_QUERY_THRESHOLD = 5
+ROBSON_SLOW_QUERY_MS = 100
+
 ROOT_URLCONF = "robson_insight.urls"
 
 TEMPLATES = [
@@ -0,0 +1,29 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+# Test and benchmark databases reuse primary keys, so their cached versions
+# and summaries must never land in the cache the application serves from
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'robson-insight-tests',
+    },
+}
+
+
+def isolated_cache():
+    return override_settings(CACHES=TEST_CACHES)
+
+
+class RobsonTestRunner(DiscoverRunner):
+    """Runs the tests against a per-process cache instead of the shared file cache."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_settings = isolated_cache()
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        super().teardown_test_environment(**kwargs)
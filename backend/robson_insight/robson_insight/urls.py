@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import metrics_view
 from .views import LoginView, LogoutView, RegisterView
 
 urlpatterns = [
@@ -9,6 +10,7 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('register/<str:token>/', RegisterView.as_view(), name='register'),
+    path('metrics', metrics_view, name='metrics'),
     
     # App Views
     path("users/", include("users.urls", namespace="users")),
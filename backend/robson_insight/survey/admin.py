@@ -4,3 +4,5 @@ from .models import *
 
 admin.site.register(Entry)
 admin.site.register(Filter)
+admin.site.register(ExportJob)
+admin.site.register(DailyEntryCount)
@@ -0,0 +1,458 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import connection
+from django.db.models import Case, DateField, F, Func, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import ExtractYear, Trunc, TruncDate
+from django.utils import timezone
+
+from .models import DailyEntryCount, Entry
+from .rollup import entry_day
+
+
+CLASSIFICATION_ORDER = [value for value, _ in Entry.CLASSIFICATIONS]
+CLASSIFICATION_CODES = {classification: code for code, classification in enumerate(CLASSIFICATION_ORDER)}
+
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+
+# Quarters and fiscal years run from July, as in the quarterly report
+FISCAL_YEAR_START_MONTH = 7
+TREND_BUCKETS = ('week', 'month', 'quarter', 'year', 'fiscal_year')
+
+EPOCH = date(1970, 1, 1)
+
+
+def distinct_entries(queryset):
+    """
+    ``queryset`` with each entry once. Filtering on ``groups`` repeats an entry
+    per matching group, which ``Count(distinct=True)`` could ignore but a sum
+    of weights can't.
+    """
+    return Entry.objects.filter(pk__in=queryset.order_by().values('pk'))
+
+
+def _classification_rows(queryset):
+    return (
+        distinct_entries(queryset)
+        .values('classification', 'csection')
+        .annotate(count=Sum('count'))
+        .order_by()
+    )
+
+
+def count_by_classification(queryset):
+    """Births per (classification, csection), summing entry weights in a single GROUP BY."""
+    rows = _classification_rows(queryset)
+    return {(row['classification'], row['csection']): row['count'] for row in rows}
+
+
+async def acount_by_classification(queryset):
+    rows = _classification_rows(queryset)
+    return {(row['classification'], row['csection']): row['count'] async for row in rows}
+
+
+def build_robson_table(counts):
+    """
+    Turn ``{(classification, csection): count}`` into Robson table metrics.
+
+    Group size is the group's share of all births, the CS rate is the share of
+    the group delivered by C-section, and the absolute/relative contributions
+    are the group's C-sections over all births and over all C-sections.
+    """
+    births = np.zeros(len(CLASSIFICATION_ORDER), dtype=np.int64)
+    csections = np.zeros(len(CLASSIFICATION_ORDER), dtype=np.int64)
+    for (classification, csection), count in counts.items():
+        births[CLASSIFICATION_CODES[classification]] += count
+        if csection:
+            csections[CLASSIFICATION_CODES[classification]] += count
+    return robson_table(births, csections)
+
+
+def robson_table(births, csections):
+    """``build_robson_table`` output for per-classification ``births`` and ``csections`` arrays."""
+    metrics = robson_metrics(births, csections)
+    groups = []
+    for code, classification in enumerate(CLASSIFICATION_ORDER):
+        groups.append({
+            'classification': classification,
+            'responses': int(births[code]),
+            'csection_count': int(csections[code]),
+            'cs_rate': _rounded(metrics['cs_rate'][code]),
+            'group_size': _rounded(metrics['group_size'][code]),
+            'absolute_contribution': _rounded(metrics['absolute_contribution'][code]),
+            'relative_contribution': _rounded(metrics['relative_contribution'][code]),
+        })
+
+    return {
+        'total_responses': int(metrics['total_responses']),
+        'total_csections': int(metrics['total_csections']),
+        'cs_rate': _rounded(metrics['overall_cs_rate']),
+        'groups': groups,
+    }
+
+
+def _rounded(value):
+    # Python's round, not np.round, so results match the scalar percentages exactly
+    return round(float(value), 2)
+
+
+def _ratio(numerator, denominator):
+    # Divide before scaling, in the same order as the scalar percentages did
+    denominator = np.broadcast_to(denominator, np.shape(numerator))
+    ratio = np.divide(
+        numerator, denominator, out=np.zeros(np.shape(numerator)), where=denominator > 0, dtype=np.float64,
+    )
+    return ratio * 100
+
+
+def robson_metrics(births, csections):
+    """
+    Robson table metrics, as unrounded percentages, for count arrays shaped
+    ``(..., 11)`` with one column per classification in ``CLASSIFICATION_ORDER``.
+    Leading axes, such as periods, are kept; the totals and ``overall_cs_rate``
+    drop the classification axis.
+    """
+    births = np.asarray(births)
+    csections = np.asarray(csections)
+    total = births.sum(axis=-1)
+    total_csections = csections.sum(axis=-1)
+    return {
+        'group_size': _ratio(births, total[..., None]),
+        'cs_rate': _ratio(csections, births),
+        'absolute_contribution': _ratio(csections, total[..., None]),
+        'relative_contribution': _ratio(csections, total_csections[..., None]),
+        'total_responses': total,
+        'total_csections': total_csections,
+        'overall_cs_rate': _ratio(total_csections, total),
+    }
+
+
+def robson_counts(codes, csection, weights=None, periods=None, n_periods=1):
+    """
+    Births and C-sections per classification as two ``(n_periods, 11)`` int
+    arrays, from one row per entry (or per aggregated cell): ``codes`` index
+    ``CLASSIFICATION_ORDER``, ``csection`` is boolean, ``weights`` are the row
+    counts (1 by default) and ``periods`` each row's period; rows whose period
+    is outside ``range(n_periods)`` are dropped.
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    csection = np.asarray(csection, dtype=bool)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+    if periods is not None:
+        periods = np.asarray(periods, dtype=np.intp)
+        if len(periods) and (periods.min() < 0 or periods.max() >= n_periods):
+            keep = (periods >= 0) & (periods < n_periods)
+            codes, csection, periods = codes[keep], csection[keep], periods[keep]
+            if weights is not None:
+                weights = weights[keep]
+        codes = periods * len(CLASSIFICATION_ORDER) + codes
+
+    shape = (n_periods, len(CLASSIFICATION_ORDER))
+    size = shape[0] * shape[1]
+    if weights is None:
+        births = np.bincount(codes, minlength=size)
+        csections = np.bincount(codes[csection], minlength=size)
+    else:
+        births = np.rint(np.bincount(codes, weights=weights, minlength=size)).astype(np.int64)
+        csections = np.rint(np.bincount(codes[csection], weights=weights[csection], minlength=size)).astype(np.int64)
+    return births.reshape(shape), csections.reshape(shape)
+
+
+def period_starts(first, last, period):
+    """
+    First days of the calendar months, quarters or years covering ``first``
+    to ``last``. Quarters start in January, April, July and October, so they
+    line up with the July-June fiscal quarters of the quarterly report.
+    """
+    if period not in PERIOD_MONTHS:
+        raise ValueError(f'Unknown period {period!r}')
+    step = PERIOD_MONTHS[period]
+    start = date(first.year, first.month - (first.month - 1) % step, 1)
+    starts = []
+    while start <= last:
+        starts.append(start)
+        month = start.month - 1 + step
+        start = date(start.year + month // 12, month % 12 + 1, 1)
+    return starts
+
+
+def to_epoch_days(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def robson_trend(codes, csection, days, starts, weights=None):
+    """
+    ``robson_counts`` per period for rows on ``days`` (days since 1970-01-01),
+    bucketed by the sorted period ``starts``; the last period is open-ended.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if not len(days) or not starts:
+        return robson_counts([], [], periods=[], n_periods=len(starts))
+    # Dates span a few thousand days, so look each day's period up in a table
+    # rather than binary-searching ten million rows
+    edges = to_epoch_days(starts)
+    low, high = min(int(days.min()), int(edges[0])), int(days.max())
+    lookup = np.searchsorted(edges, np.arange(low, high + 1), side='right') - 1
+    return robson_counts(codes, csection, weights, lookup[days - low], len(starts))
+
+
+def _rounded_lists(values):
+    return [[_rounded(value) for value in row] for row in values.tolist()]
+
+
+def robson_report(codes, csection, days, weights=None, period='quarter', first=None, last=None):
+    """
+    The Robson table over all rows plus the same metrics per ``period``
+    between ``first`` and ``last`` (by default the first and last day with
+    data), as arrays indexed ``[period][classification]`` in
+    ``CLASSIFICATION_ORDER``.
+    """
+    births, csections = robson_counts(codes, csection, weights)
+    if len(days):
+        first = first or EPOCH + timedelta(days=int(days.min()))
+        last = last or EPOCH + timedelta(days=int(days.max()))
+    starts = period_starts(first, last, period) if first and last else []
+    period_births, period_csections = robson_trend(codes, csection, days, starts, weights)
+    metrics = robson_metrics(period_births, period_csections)
+
+    return {
+        'classifications': CLASSIFICATION_ORDER,
+        'summary': robson_table(births[0], csections[0]),
+        'period': period,
+        'periods': [start.isoformat() for start in starts],
+        'trend': {
+            'responses': period_births.tolist(),
+            'csection_count': period_csections.tolist(),
+            'cs_rate': _rounded_lists(metrics['cs_rate']),
+            'group_size': _rounded_lists(metrics['group_size']),
+            'absolute_contribution': _rounded_lists(metrics['absolute_contribution']),
+            'relative_contribution': _rounded_lists(metrics['relative_contribution']),
+            'total_responses': metrics['total_responses'].tolist(),
+            'total_csections': metrics['total_csections'].tolist(),
+            'overall_cs_rate': [_rounded(value) for value in metrics['overall_cs_rate'].tolist()],
+        },
+    }
+
+
+def daily_arrays(group_ids, start_date=None, end_date=None):
+    """
+    ``(codes, csection, days, weights)`` arrays with the births per day,
+    classification and C-section status in ``group_ids``. One group is read
+    from the daily rollup; wider scopes sum the distinct entries per day.
+    """
+    if len(group_ids) == 1:
+        rows = DailyEntryCount.objects.filter(group_id=group_ids[0])
+        if start_date:
+            rows = rows.filter(date__gte=entry_day(start_date))
+        if end_date:
+            rows = rows.filter(date__lte=entry_day(end_date))
+        rows = rows.filter(count__gt=0).values_list('classification', 'csection', 'date', 'count')
+    else:
+        entries = Entry.objects.filter(groups__in=group_ids)
+        if start_date:
+            entries = entries.filter(date__gte=start_date)
+        if end_date:
+            entries = entries.filter(date__lte=end_date)
+        rows = (
+            distinct_entries(entries)
+            .annotate(day=TruncDate('date'))
+            .values_list('classification', 'csection', 'day')
+            .annotate(total=Sum('count'))
+            .order_by()
+        )
+
+    rows = list(rows)
+    return (
+        np.fromiter((CLASSIFICATION_CODES[row[0]] for row in rows), dtype=np.intp, count=len(rows)),
+        np.fromiter((row[1] for row in rows), dtype=bool, count=len(rows)),
+        to_epoch_days([row[2] for row in rows]) if rows else np.zeros(0, dtype=np.int64),
+        np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows)),
+    )
+
+
+def robson_summary(queryset):
+    return build_robson_table(count_by_classification(queryset))
+
+
+async def arobson_summary(queryset):
+    return build_robson_table(await acount_by_classification(queryset))
+
+
+def count_by_period(queryset, periods, date_field='date', total=None):
+    """
+    Count rows per ``(period index, classification, csection)`` with a single
+    GROUP BY. ``periods`` is a list of inclusive ``(start, end)`` bounds; rows
+    outside every period are ignored. ``total`` defaults to summing the
+    weights of distinct entries; pass ``Sum('count')`` for the rollup.
+    """
+    if not periods:
+        return {}
+    if total is None:
+        queryset = distinct_entries(queryset)
+        total = Sum('count')
+
+    period = Case(
+        *[
+            When(**{f'{date_field}__gte': start, f'{date_field}__lte': end}, then=Value(index))
+            for index, (start, end) in enumerate(periods)
+        ],
+        default=None,
+        output_field=IntegerField(),
+    )
+    rows = (
+        queryset.order_by()
+        .filter(**{f'{date_field}__gte': periods[0][0], f'{date_field}__lte': periods[-1][1]})
+        .annotate(period=period)
+        .values('period', 'classification', 'csection')
+        .annotate(total=total)
+    )
+    return {
+        (row['period'], row['classification'], row['csection']): row['total']
+        for row in rows if row['period'] is not None
+    }
+
+
+# SQLite templates over the stored ISO text ("YYYY-MM-DD..."). Django's Trunc
+# and Extract call back into Python once per row on SQLite, which dominates a
+# long trend; slicing the text stays in C.
+_YEAR = "CAST(substr(%(expressions)s, 1, 4) AS INTEGER)"
+_MONTH = "CAST(substr(%(expressions)s, 6, 2) AS INTEGER)"
+SQLITE_BUCKETS = {
+    'week': "date(%(expressions)s, '-' || ((CAST(strftime('%%%%w', %(expressions)s) AS INTEGER) + 6) %%%% 7) || ' days')",
+    'month': "substr(%(expressions)s, 1, 8) || '01'",
+    'quarter': f"substr(%(expressions)s, 1, 5) || printf('%%%%02d', ({_MONTH} - 1) / 3 * 3 + 1) || '-01'",
+    'year': "substr(%(expressions)s, 1, 5) || '01-01'",
+    'fiscal_year': f"({_YEAR} - ({_MONTH} < {FISCAL_YEAR_START_MONTH}))",
+}
+
+
+def bucket_expression(bucket, field='date', sqlite=False):
+    """
+    Database expression for the trend bucket of ``field``: the first day of its
+    week, month, quarter or year, or for ``fiscal_year`` the calendar year the
+    July-June fiscal year starts in. ``sqlite`` uses SQLite's own date
+    functions, which read the stored value and so ignore the current time zone.
+    """
+    if sqlite and bucket in SQLITE_BUCKETS:
+        output_field = IntegerField() if bucket == 'fiscal_year' else DateField()
+        return Func(F(field), template=SQLITE_BUCKETS[bucket], output_field=output_field)
+    if bucket == 'fiscal_year':
+        return ExtractYear(field) - Case(
+            When(**{f'{field}__month__lt': FISCAL_YEAR_START_MONTH}, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    if bucket not in TREND_BUCKETS:
+        raise ValueError(f'Unknown bucket {bucket!r}')
+    return Trunc(field, bucket, output_field=DateField())
+
+
+def bucket_rows(group_ids, bucket, start_date=None, end_date=None):
+    """
+    ``(period, classification, csection, births)`` rows summed per bucket in
+    the database. One group is read from the daily rollup; wider scopes sum
+    the distinct entries.
+    """
+    if len(group_ids) == 1:
+        rows = DailyEntryCount.objects.filter(group_id=group_ids[0])
+        if start_date:
+            rows = rows.filter(date__gte=entry_day(start_date))
+        if end_date:
+            rows = rows.filter(date__lte=entry_day(end_date))
+    else:
+        entries = Entry.objects.filter(groups__in=group_ids)
+        if start_date:
+            entries = entries.filter(date__gte=start_date)
+        if end_date:
+            entries = entries.filter(date__lte=end_date)
+        rows = distinct_entries(entries)
+
+    # Rollup days are already local; entry datetimes are stored in UTC
+    sqlite = connection.vendor == 'sqlite' and (len(group_ids) == 1 or timezone.get_current_timezone_name() == 'UTC')
+    return (
+        rows.annotate(period=bucket_expression(bucket, sqlite=sqlite))
+        .values_list('period', 'classification', 'csection')
+        .annotate(total=Sum('count'))
+        .order_by()
+    )
+
+
+def bucket_start(period, bucket):
+    if bucket == 'fiscal_year':
+        return date(period, FISCAL_YEAR_START_MONTH, 1)
+    return period
+
+
+def bucket_label(start, bucket):
+    """"2024-W03", "2024-01", "Q3 2023-24", "2024" or "2023-24" for a bucket's first day."""
+    if bucket == 'week':
+        year, week, _ = start.isocalendar()
+        return f'{year}-W{week:02d}'
+    if bucket == 'month':
+        return f'{start.year}-{start.month:02d}'
+    if bucket == 'year':
+        return str(start.year)
+
+    fiscal_year = start.year if start.month >= FISCAL_YEAR_START_MONTH else start.year - 1
+    label = f'{fiscal_year}-{(fiscal_year + 1) % 100:02d}'
+    if bucket == 'quarter':
+        quarter = (start.month - FISCAL_YEAR_START_MONTH) % 12 // 3 + 1
+        return f'Q{quarter} {label}'
+    return label
+
+
+def robson_buckets(rows, bucket):
+    """
+    Per-bucket births, C-sections and CS rates from ``bucket_rows`` as arrays
+    indexed ``[period][classification]``, with only the buckets that have data.
+    """
+    rows = [row for row in rows if row[3]]
+    starts = sorted({bucket_start(row[0], bucket) for row in rows})
+    index = {start: position for position, start in enumerate(starts)}
+    births, csections = robson_counts(
+        [CLASSIFICATION_CODES[row[1]] for row in rows],
+        [row[2] for row in rows],
+        [row[3] for row in rows],
+        [index[bucket_start(row[0], bucket)] for row in rows],
+        len(starts),
+    )
+    metrics = robson_metrics(births, csections)
+    return {
+        'bucket': bucket,
+        'classifications': CLASSIFICATION_ORDER,
+        'periods': [start.isoformat() for start in starts],
+        'labels': [bucket_label(start, bucket) for start in starts],
+        'responses': births.tolist(),
+        'csection_count': csections.tolist(),
+        'cs_rate': _rounded_lists(metrics['cs_rate']),
+        'total_responses': metrics['total_responses'].tolist(),
+        'total_csections': metrics['total_csections'].tolist(),
+        'overall_cs_rate': [_rounded(value) for value in metrics['overall_cs_rate'].tolist()],
+    }
+
+
+def group_comparison_counts(group_ids, start_date=None, end_date=None):
+    """
+    Births and C-sections per ``(group, classification)`` as two
+    ``(len(group_ids), 11)`` arrays, read from the rollup with one query that
+    has a conditional ``SUM`` column per group.
+    """
+    rows = DailyEntryCount.objects.filter(group_id__in=group_ids)
+    if start_date:
+        rows = rows.filter(date__gte=entry_day(start_date))
+    if end_date:
+        rows = rows.filter(date__lte=entry_day(end_date))
+    columns = {f'group_{index}': Sum('count', filter=Q(group_id=group_id)) for index, group_id in enumerate(group_ids)}
+
+    births = np.zeros((len(group_ids), len(CLASSIFICATION_ORDER)), dtype=np.int64)
+    csections = np.zeros_like(births)
+    if not group_ids:
+        return births, csections
+    for row in rows.values('classification', 'csection').annotate(**columns).order_by():
+        code = CLASSIFICATION_CODES[row['classification']]
+        totals = [row[f'group_{index}'] or 0 for index in range(len(group_ids))]
+        births[:, code] += totals
+        if row['csection']:
+            csections[:, code] += totals
+    return births, csections
@@ -0,0 +1,145 @@
+"""
+Async variants of the read-heavy survey endpoints, mounted under
+``survey/async/``. They return the same bodies as their DRF counterparts in
+``views.py`` and share the same cache keys.
+"""
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse
+
+from robson_insight.async_views import AsyncTokenView
+from robson_insight.cache import CACHE_TIMEOUT, aget_version, aget_versions
+from users.memberships import aget_memberships, aviewable_group_ids
+from . import rollup
+from .analytics import arobson_summary, build_robson_table
+from .fast_serializers import build_entry_data
+from .models import Entry, Filter
+from .pagination import EntryCursorPagination
+from .views import entry_summary_key, filter_groups_key, parse_date_range
+
+CHUNK_SIZE = 2000
+
+
+async def ascoped_groups(request, pk=None):
+    """Async counterpart of ``EntryScopeMixin.get_scoped_groups``."""
+    if pk is None:
+        return await aviewable_group_ids(request)
+
+    if pk.startswith('filter-'):
+        return await afilter_groups(request, pk.split('-')[1])
+    elif pk.startswith('group-'):
+        group_id = pk.split('-')[1]
+        try:
+            membership = (await aget_memberships(request)).get(int(group_id))
+        except ValueError:
+            membership = None
+        if membership is None or not (membership.can_view or membership.is_admin):
+            raise PermissionDenied("You do not have permission to view entries for this group.")
+        return [int(group_id)]
+    else:
+        return []
+
+
+async def afilter_groups(request, filter_id):
+    try:
+        filter_id = int(filter_id)
+    except ValueError:
+        return []
+    key = filter_groups_key(filter_id, await aget_version('filter', filter_id))
+    cached = await cache.aget(key)
+    if cached is None:
+        links = Filter.groups.through.objects.filter(filter_id=filter_id)
+        cached = (
+            await Filter.objects.filter(pk=filter_id).values_list('user_id', flat=True).afirst(),
+            [group_id async for group_id in links.values_list('group_id', flat=True)],
+        )
+        await cache.aset(key, cached, CACHE_TIMEOUT)
+
+    owner_id, group_ids = cached
+    if owner_id != request.user.pk:
+        return []
+    allowed_groups = set(await aviewable_group_ids(request))
+    return [group_id for group_id in group_ids if group_id in allowed_groups]
+
+
+async def aentry_rows(entries):
+    """``EntrySerializer`` output for already fetched entries, with one query for their groups."""
+    groups = {entry.pk: [] for entry in entries}
+    links = Entry.groups.through.objects.filter(entry_id__in=list(groups)).order_by('group_id')
+    async for entry_id, group_id, name in links.values_list('entry_id', 'group_id', 'group__name'):
+        groups[entry_id].append({'id': group_id, 'name': name})
+    return build_entry_data(
+        [
+            {
+                'id': entry.pk,
+                'username': entry.user.username if entry.user else None,
+                'classification': entry.classification,
+                'csection': entry.csection,
+                'count': entry.count,
+                'date': entry.date,
+            }
+            for entry in entries
+        ],
+        groups,
+    )
+
+
+class AsyncEntrySummaryView(AsyncTokenView):
+    """Async ``EntrySummaryView``."""
+
+    async def get(self, request, pk=None):
+        try:
+            start_date, end_date = parse_date_range(request.GET.get('start_date'), request.GET.get('end_date'))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid date format'}, status=400)
+
+        groups = sorted(await ascoped_groups(request, pk))
+        key = entry_summary_key(groups, await aget_versions('group', groups), start_date, end_date)
+        summary = await cache.aget(key)
+        if summary is None:
+            if len(groups) == 1:
+                summary = build_robson_table(await rollup.acounts_for_group(groups[0], start_date, end_date))
+            else:
+                entries = Entry.objects.filter(groups__in=groups)
+                if start_date:
+                    entries = entries.filter(date__gte=start_date)
+                if end_date:
+                    entries = entries.filter(date__lte=end_date)
+                summary = await arobson_summary(entries)
+            await cache.aset(key, summary, CACHE_TIMEOUT)
+        return JsonResponse(summary)
+
+
+class AsyncEntryListView(AsyncTokenView):
+    """Async ``EntryListView`` (listing only), with the same opt-in cursor pagination."""
+
+    async def get(self, request):
+        allowed_groups = await aviewable_group_ids(request)
+        queryset = Entry.objects.filter(groups__in=allowed_groups).distinct().select_related('user')
+
+        paginator = EntryCursorPagination()
+        page = await paginator.apaginate_queryset(queryset, request)
+        if page is not None:
+            return JsonResponse(paginator.get_paginated_data(await aentry_rows(page)))
+
+        rows = []
+        chunk = []
+        async for entry in queryset.aiterator(chunk_size=CHUNK_SIZE):
+            chunk.append(entry)
+            if len(chunk) == CHUNK_SIZE:
+                rows.extend(await aentry_rows(chunk))
+                chunk = []
+        rows.extend(await aentry_rows(chunk))
+        return JsonResponse(rows, safe=False)
+
+
+class AsyncFilterDetailView(AsyncTokenView):
+    """Async ``FilterConfigurationDetailView``: the group ids of one of the user's filters."""
+
+    async def get(self, request, pk):
+        try:
+            filter_instance = await Filter.objects.aget(pk=pk, user=request.user)
+        except Filter.DoesNotExist:
+            raise Http404
+        group_ids = filter_instance.groups.values_list('id', flat=True)
+        return JsonResponse([group_id async for group_id in group_ids], safe=False)
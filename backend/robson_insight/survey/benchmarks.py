@@ -0,0 +1,223 @@
+"""
+Synthetic data and timings for the benchmark suite run by
+``manage.py run_benchmarks``.
+
+Entries follow a typical Robson distribution: each classification's share
+of births and its C-section rate below are in the range reported by
+national Robson audits, so group sizes and CS rates look like a real unit.
+"""
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import Group, UserProfile
+from .models import Entry
+from .rollup import rebuild
+
+
+# classification: (share of births, C-section rate)
+ROBSON_DISTRIBUTION = {
+    '1': (0.20, 0.12),
+    '2': (0.12, 0.35),
+    '3': (0.30, 0.03),
+    '4': (0.10, 0.18),
+    '5.1': (0.08, 0.75),
+    '5.2': (0.02, 0.85),
+    '6': (0.025, 0.90),
+    '7': (0.015, 0.85),
+    '8': (0.015, 0.60),
+    '9': (0.005, 0.99),
+    '10': (0.10, 0.25),
+}
+
+QUARTER_HEADERS = [
+    'Quarter 1: 1st July 2023 - 30th September 2023',
+    'Quarter 2: 1st October 2023 - 31st December 2023',
+    'Quarter 3: 1st January 2024 - 31st March 2024',
+    'Quarter 4: 1st April 2024 - 30th June 2024',
+]
+
+BENCHMARK_PASSWORD = 'benchmark'
+
+
+def robson_sample(rng):
+    """One ``(classification, csection)`` drawn from ``ROBSON_DISTRIBUTION``."""
+    classifications = list(ROBSON_DISTRIBUTION)
+    weights = [share for share, _ in ROBSON_DISTRIBUTION.values()]
+    classification = rng.choices(classifications, weights)[0]
+    return classification, rng.random() < ROBSON_DISTRIBUTION[classification][1]
+
+
+def generate_dataset(groups=5, users=20, entries=10_000, seed=0, days=730):
+    """
+    Create ``groups`` groups, ``users`` users spread over them and ``entries``
+    entries over the last ``days`` days, each linked to one or two groups.
+    The first user is an admin of every group and is returned with the groups.
+    """
+    rng = random.Random(seed)
+    group_objects = Group.objects.bulk_create([Group(name=f'Benchmark unit {index + 1}') for index in range(groups)])
+
+    user_objects = [
+        User.objects.create_user(
+            username=f'benchmark{index}@example.com', email=f'benchmark{index}@example.com',
+            password=BENCHMARK_PASSWORD if index == 0 else None,
+        )
+        for index in range(users)
+    ]
+    profiles = [UserProfile(user=user_objects[0], group=group, is_admin=True) for group in group_objects]
+    for index, user in enumerate(user_objects[1:]):
+        group = group_objects[index % groups]
+        profiles.append(UserProfile(user=user, group=group, can_view=rng.random() < 0.7, can_add=True))
+    UserProfile.objects.bulk_create(profiles)
+
+    now = timezone.now()
+    entry_objects = []
+    for _ in range(entries):
+        classification, csection = robson_sample(rng)
+        entry_objects.append(Entry(
+            user=rng.choice(user_objects),
+            classification=classification,
+            csection=csection,
+            date=now - timedelta(minutes=rng.randrange(days * 24 * 60)),
+        ))
+    entry_objects = Entry.objects.bulk_create(entry_objects, batch_size=5000)
+    Entry.groups.through.objects.bulk_create(
+        [
+            Entry.groups.through(entry_id=entry.pk, group_id=group.pk)
+            for entry in entry_objects
+            for group in rng.sample(group_objects, 1 if rng.random() < 0.8 or groups == 1 else 2)
+        ],
+        batch_size=5000,
+    )
+    rebuild()
+    return user_objects[0], group_objects
+
+
+def quarterly_csv(births_per_quarter, rng):
+    """A quarterly upload sheet with ``births_per_quarter`` births in each quarter."""
+    lines = [
+        'Robson report',
+        'Group Robson,' + ''.join(f'{header},,' for header in QUARTER_HEADERS) + 'Final,',
+        ',' + ','.join('Vaginal Delivery,C/Section' for _ in range(len(QUARTER_HEADERS) + 1)),
+    ]
+    for classification, (share, cs_rate) in ROBSON_DISTRIBUTION.items():
+        cells = []
+        for _ in QUARTER_HEADERS:
+            births = round(births_per_quarter * share * rng.uniform(0.8, 1.2))
+            csections = round(births * cs_rate)
+            cells += [str(births - csections), str(csections)]
+        lines.append(f'Group {classification},' + ','.join(cells) + ',,')
+    return '\n'.join(lines) + '\n'
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def consume(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def measure(request, repeat=5, rollback=False):
+    """
+    Run ``request()`` once under tracemalloc for the query count and peak
+    memory, then ``repeat`` more times for latency. With ``rollback`` each
+    call is undone so writes don't change the dataset between runs.
+    """
+    def call():
+        with transaction.atomic():
+            response = request()
+            size = consume(response)
+            transaction.set_rollback(rollback)
+        return response, size
+
+    # CaptureQueriesContext would lose the count when request_started resets the query log
+    queries = []
+    tracemalloc.start()
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        response, size = call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'status': response.status_code,
+        'response_bytes': size,
+        'queries': len(queries),
+        'peak_memory_kib': round(peak / 1024, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 2),
+            'p95': round(percentile(latencies, 0.95), 2),
+            'p99': round(percentile(latencies, 0.99), 2),
+            'mean': round(statistics.fmean(latencies), 2),
+        },
+    }
+
+
+def run_suite(admin, groups, repeat=5, invites=100, seed=0):
+    """Time each endpoint as ``admin`` and return ``{name: measurements}``."""
+    rng = random.Random(seed)
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=admin)
+    client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+    group = groups[0]
+    today = timezone.localdate()
+    upload = quarterly_csv(births_per_quarter=400, rng=rng)
+    emails = [f'invitee{index}@example.com' for index in range(invites)]
+
+    scenarios = {
+        'entries': lambda: client.get('/survey/entries/'),
+        'entries_page': lambda: client.get('/survey/entries/', {'page_size': 100}),
+        'entries_filter': lambda: client.get(f'/survey/entries/filter/group-{group.pk}/'),
+        'filter_entries_by_date': lambda: client.post('/survey/filter-entries-by-date/', {
+            'start_date': (today - timedelta(days=90)).isoformat(), 'end_date': today.isoformat(),
+        }),
+        'download_survey_csv': lambda: client.get('/survey/download-survey-csv/'),
+        'entries_upload': lambda: client.post('/survey/entries/upload/', {
+            'file': SimpleUploadedFile('upload.csv', upload.encode(), content_type='text/csv'),
+        }),
+        'mass_invite': lambda: client.post(f'/users/mass-invite/{group.pk}/', {'emails': emails}, format='json'),
+    }
+    writes = {'entries_upload', 'mass_invite'}
+    return {
+        name: measure(request, repeat=repeat, rollback=name in writes)
+        for name, request in scenarios.items()
+    }
+
+
+def compare(current, previous):
+    """``{endpoint: {metric: (previous, current, change)}}`` for p50 latency, queries and memory."""
+    report = {}
+    for name, result in current.items():
+        before = previous.get(name)
+        if before is None:
+            continue
+        report[name] = {}
+        for metric, read in (
+            ('p50_ms', lambda r: r['latency_ms']['p50']),
+            ('queries', lambda r: r['queries']),
+            ('peak_memory_kib', lambda r: r['peak_memory_kib']),
+        ):
+            old, new = read(before), read(result)
+            change = (new - old) / old if old else 0.0
+            report[name][metric] = (old, new, round(change, 3))
+    return report
@@ -0,0 +1,61 @@
+import csv
+from collections import defaultdict
+from itertools import islice
+
+from .models import Entry
+from users.models import UserProfile
+
+
+CSV_HEADER = ['id', 'classification', 'user', 'csection', 'count', 'date', 'groups']
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer: ``write`` hands the line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def exportable_entries(user):
+    """Entries written by anyone who shares a viewable group with ``user``."""
+    return Entry.objects.filter(
+        user__in=UserProfile.objects.filter(
+            group__in=UserProfile.objects.filter(
+                user=user, can_view=True
+            ).values_list('group', flat=True)
+        ).values_list('user', flat=True).distinct()
+    )
+
+
+def iter_entry_rows(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yield CSV rows in ``CSV_HEADER`` order. Entries are read with a chunked
+    cursor and the group names for each chunk are fetched in one extra query,
+    so memory stays flat and there is no per-row groups lookup.
+    """
+    rows = queryset.order_by('pk').values_list(
+        'pk', 'classification', 'user__username', 'csection', 'count', 'date'
+    ).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        group_names = defaultdict(list)
+        links = Entry.groups.through.objects.filter(
+            entry_id__in=[row[0] for row in chunk]
+        ).order_by('pk').values_list('entry_id', 'group__name')
+        for entry_id, name in links:
+            group_names[entry_id].append(name)
+
+        for row in chunk:
+            yield [*row, ', '.join(group_names[row[0]])]
+
+
+def iter_csv_lines(queryset, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(Echo(), delimiter=",")
+    yield writer.writerow(CSV_HEADER)
+    for row in iter_entry_rows(queryset, chunk_size):
+        yield writer.writerow(row)
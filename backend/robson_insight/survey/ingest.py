@@ -0,0 +1,175 @@
+import csv
+import io
+import logging
+import os
+import re
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from openpyxl import load_workbook
+
+from . import rollup
+from .models import ChangeSequence, Entry
+from robson_insight.cache import bump_versions
+from users.models import UserProfile
+
+
+logger = logging.getLogger(__name__)
+
+VALID_CLASSIFICATIONS = {value for value, _ in Entry.CLASSIFICATIONS}
+
+
+class InvalidSheetFormat(Exception):
+    pass
+
+
+def read_sheet(file):
+    """
+    Stream the rows of an uploaded quarterly CSV/XLSX as tuples of cell
+    values, reading the file once. XLSX formulas come back as their cached values.
+    """
+    _, file_extension = os.path.splitext(file.name)
+
+    if file_extension == '.csv':
+        yield from csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+
+    elif file_extension == '.xlsx':
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    else:
+        raise InvalidSheetFormat
+
+
+def _cell(row, column):
+    return row[column] if column < len(row) else None
+
+
+def _cell_startswith(row, column, prefix):
+    value = _cell(row, column)
+    return isinstance(value, str) and value.startswith(prefix)
+
+
+def _is_blank(row):
+    return all(cell is None or str(cell).strip() == '' for cell in row)
+
+
+def _cell_count(value):
+    if value is None or value == '':
+        return 0
+    try:
+        return int(float(value))
+    except (TypeError, ValueError) as e:
+        raise InvalidSheetFormat from e
+
+
+def parse_quarter_date(header):
+    """Date of a "Quarter 1: 1st July 2023 - 30th September 2023" header: its last day, capped at now."""
+    end = re.sub(r'(\d+)(st|nd|rd|th)', r'\1', header.split("- ")[1]).strip()
+    return min(datetime.strptime(end, '%d %B %Y'), datetime.now())
+
+
+def parse_sheet(rows):
+    """
+    Walk the quarterly template in one pass over ``rows`` and yield
+    ``(classification, csection, date, count)`` tuples, one per non-empty
+    cell. The header row is the first one starting with "Group"; each
+    "Quarter" column in it spans a vaginal and a C/S column. Blank rows are
+    skipped, as ``read_csv`` did.
+    """
+    rows = iter(rows)
+    header = next((row for row in rows if str(_cell(row, 0)).strip().lower().startswith("group")), None)
+    if header is None or not _cell_startswith(header, 1, "Quarter"):
+        raise InvalidSheetFormat
+
+    quarters = []
+    column = 1
+    while _cell_startswith(header, column, "Quarter"):
+        quarters.append((column, parse_quarter_date(header[column])))
+        column += 2
+
+    # Skip the "Vaginal Delivery / C/Section" row under the header
+    next(rows, None)
+
+    found = False
+    ended = False
+    for row in rows:
+        if _is_blank(row):
+            continue
+        if not _cell_startswith(row, 0, "Group"):
+            # Totals or notes after the classifications
+            ended = True
+            continue
+        if ended:
+            # Classifications must not be split by other rows, or some would be misread
+            raise InvalidSheetFormat
+        found = True
+        classification = row[0].split(' ')[1]
+        if classification not in VALID_CLASSIFICATIONS:
+            raise InvalidSheetFormat
+
+        for column, date in quarters:
+            for csection, count_column in ((False, column), (True, column + 1)):
+                count = _cell_count(_cell(row, count_column))
+                if count > 0:
+                    yield classification, csection, date, count
+
+    if not found:
+        raise InvalidSheetFormat
+
+
+def bulk_create_entries(user, rows, group_ids=None, batch_size=1000, weighted=None):
+    """
+    Insert the parsed sheet in one transaction: one ``bulk_create`` for the
+    entries and one for the ``Entry.groups`` through-table rows, linking every
+    entry to ``group_ids`` (by default all groups the user belongs to).
+
+    With ``weighted`` (default ``ROBSON_WEIGHTED_UPLOADS``) each sheet cell
+    becomes a single entry whose ``count`` is the cell's value; otherwise
+    every birth gets its own entry. Returns the number of births.
+    """
+    started = time.perf_counter()
+    if group_ids is None:
+        group_ids = list(UserProfile.objects.filter(user=user).values_list('group', flat=True).distinct())
+    if weighted is None:
+        weighted = getattr(settings, 'ROBSON_WEIGHTED_UPLOADS', True)
+
+    if weighted:
+        entries = [
+            Entry(user=user, classification=classification, csection=csection, date=date, count=count)
+            for classification, csection, date, count in rows
+        ]
+    else:
+        entries = [
+            Entry(user=user, classification=classification, csection=csection, date=date)
+            for classification, csection, date, count in rows
+            for _ in range(count)
+        ]
+
+    EntryGroup = Entry.groups.through
+    with transaction.atomic():
+        # bulk_create bypasses Entry.save, so number the entries for the sync feed here
+        for entry, seq in zip(entries, ChangeSequence.allocate(len(entries))):
+            entry.change_seq = seq
+        created = Entry.objects.bulk_create(entries, batch_size=batch_size)
+        links = [
+            EntryGroup(entry_id=entry.pk, group_id=group_id)
+            for entry in created
+            for group_id in group_ids
+        ]
+        EntryGroup.objects.bulk_create(links, batch_size=batch_size)
+        # bulk_create skips signals, so update the rollup from the parsed cells
+        rollup.apply_deltas(rollup.sheet_deltas(rows, group_ids))
+        bump_versions('group', group_ids)
+
+    births = sum(entry.count for entry in created)
+    logger.info(
+        "Uploaded %d births as %d entries (%d group links, %d sheet cells) in %.3fs",
+        births, len(created), len(links), len(rows), time.perf_counter() - started,
+    )
+    return births
@@ -0,0 +1,119 @@
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMessage
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .export import exportable_entries, iter_csv_lines
+from .models import ExportJob
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30
+# A running job whose worker hasn't finished it by then is assumed lost
+LEASE_SECONDS = 15 * 60
+
+
+def enqueue_export(user, email):
+    return ExportJob.objects.create(user=user, email=email)
+
+
+def _claimable(now):
+    due = Q(status=ExportJob.PENDING, run_after__lte=now)
+    lost = Q(status=ExportJob.RUNNING, lease_expires__lte=now)
+    return due | lost
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest due pending job, or a running job whose lease
+    has expired because its worker died, to running under a new lease. Each
+    claim counts as an attempt. The conditional UPDATE means two workers can
+    never pick up the same job.
+    """
+    now = timezone.now()
+    candidates = ExportJob.objects.filter(_claimable(now)).order_by('run_after', 'pk').values_list('pk', flat=True)
+
+    for pk in candidates[:10]:
+        claimed = ExportJob.objects.filter(_claimable(now), pk=pk).update(
+            status=ExportJob.RUNNING,
+            attempts=F('attempts') + 1,
+            lease_expires=now + timedelta(seconds=LEASE_SECONDS),
+        )
+        if claimed:
+            return ExportJob.objects.select_related('user').get(pk=pk)
+    return None
+
+
+def send_export(job):
+    email = EmailMessage(
+        subject='Survey Data CSV',
+        body='Please see the attached survey data.',
+        to=[job.email]
+    )
+    email.attach('survey_data.csv', ''.join(iter_csv_lines(exportable_entries(job.user))), 'text/csv')
+    email.send()
+
+
+def run_job(job):
+    """Send one claimed export, rescheduling with exponential backoff if it fails."""
+    job.lease_expires = None
+    if job.attempts > MAX_ATTEMPTS:
+        # Reclaimed after the worker running its last attempt stopped
+        job.status = ExportJob.FAILED
+        job.error = job.error or 'Worker stopped during the last attempt.'
+        job.finished_on = timezone.now()
+        save_outcome(job)
+        return job
+
+    try:
+        send_export(job)
+    except Exception as e:
+        job.error = str(e)
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = ExportJob.FAILED
+            job.finished_on = timezone.now()
+        else:
+            job.status = ExportJob.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+        logger.warning("Export job %s attempt %d failed: %s", job.pk, job.attempts, e)
+    else:
+        job.status = ExportJob.DONE
+        job.error = ''
+        job.finished_on = timezone.now()
+    save_outcome(job)
+    return job
+
+
+def save_outcome(job):
+    """
+    Store the result of ``job``'s attempt, unless its lease expired and
+    another worker has claimed it since; that worker now owns the row.
+    """
+    saved = ExportJob.objects.filter(pk=job.pk, status=ExportJob.RUNNING, attempts=job.attempts).update(
+        status=job.status,
+        error=job.error,
+        run_after=job.run_after,
+        finished_on=job.finished_on,
+        lease_expires=None,
+    )
+    if not saved:
+        logger.warning(
+            "Export job %s was reclaimed during attempt %d; its outcome (%s) was not saved",
+            job.pk, job.attempts, job.status,
+        )
+    return bool(saved)
+
+
+def run_pending_jobs():
+    """Run every job that is currently due. Returns how many were processed."""
+    processed = 0
+    while True:
+        job = claim_next_job()
+        if job is None:
+            return processed
+        run_job(job)
+        processed += 1
@@ -0,0 +1,83 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from survey.fast_serializers import serialize_entries
+from survey.models import Entry
+from survey.serializers import EntrySerializer
+from users.models import Group
+
+
+class Command(BaseCommand):
+    help = (
+        "Times EntrySerializer against the values() fast path on synthetic entries. "
+        "Everything is created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help="Number of entries to serialize.")
+        parser.add_argument('--groups', type=int, default=3, help="Groups each entry may belong to.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            queryset = self.seed(options['rows'], options['groups'], random.Random(options['seed']))
+
+            started = time.perf_counter()
+            drf = EntrySerializer(
+                queryset.select_related('user').prefetch_related(
+                    Prefetch('groups', queryset=Group.objects.order_by('pk'))
+                ),
+                many=True,
+            ).data
+            drf_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            fast = serialize_entries(queryset)
+            fast_seconds = time.perf_counter() - started
+
+            identical = [dict(row) for row in drf] == fast
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"rows:            {options['rows']}")
+        self.stdout.write(f"EntrySerializer: {drf_seconds:.3f}s")
+        self.stdout.write(f"fast path:       {fast_seconds:.3f}s")
+        self.stdout.write(f"speedup:         {drf_seconds / fast_seconds:.1f}x")
+        self.stdout.write(f"identical:       {identical}")
+
+    def seed(self, rows, group_count, rng):
+        users = [
+            User.objects.create(username=f'benchmark-user-{index}-{time.time_ns()}')
+            for index in range(10)
+        ]
+        groups = [Group.objects.create(name=f'Benchmark group {index}') for index in range(group_count)]
+        classifications = [value for value, _ in Entry.CLASSIFICATIONS]
+        start = timezone.now() - timedelta(days=365)
+
+        entries = Entry.objects.bulk_create(
+            [
+                Entry(
+                    user=rng.choice(users),
+                    classification=rng.choice(classifications),
+                    csection=rng.random() < 0.3,
+                    date=start + timedelta(minutes=rng.randrange(365 * 24 * 60)),
+                )
+                for _ in range(rows)
+            ],
+            batch_size=5000,
+        )
+        Entry.groups.through.objects.bulk_create(
+            [
+                Entry.groups.through(entry_id=entry.pk, group_id=group.pk)
+                for entry in entries
+                for group in rng.sample(groups, rng.randint(1, group_count))
+            ],
+            batch_size=5000,
+        )
+        return Entry.objects.filter(groups__in=groups).distinct().order_by('pk')
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from survey.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Worker for queued CSV exports: generates each file and emails it, retrying with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process the jobs that are due and exit.")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds to sleep between polls.")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_pending_jobs()
+            if processed:
+                self.stdout.write(f"Processed {processed} export job(s).")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from survey.sync import PRUNE_BATCH_SIZE, prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Deletes sync tombstones older than ROBSON_SYNC_TOMBSTONE_DAYS in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Prune once and exit.")
+        parser.add_argument('--interval', type=float, default=86400, help="Seconds to sleep between runs.")
+        parser.add_argument('--days', type=int, help="Retention in days, overriding the setting.")
+        parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE, help="Tombstones deleted per statement.")
+
+    def handle(self, *args, **options):
+        while True:
+            removed = prune_tombstones(days=options['days'], batch_size=options['batch_size'])
+            self.stdout.write(f"Removed {removed} sync tombstone(s).")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
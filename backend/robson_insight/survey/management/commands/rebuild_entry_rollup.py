@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from survey.rollup import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-group daily entry rollup from scratch."
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(f"Rebuilt rollup with {count} row(s).")
@@ -0,0 +1,85 @@
+import json
+import platform
+import subprocess
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+
+from robson_insight.test_runner import isolated_cache
+
+from survey.benchmarks import compare, generate_dataset, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the main survey and users endpoints on synthetic data in a throwaway "
+        "test database and writes latency percentiles, query counts and peak memory as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--entries', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per endpoint.")
+        parser.add_argument('--invites', type=int, default=100, help="Addresses per mass invite.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='benchmark-results.json')
+        parser.add_argument('--compare', help="Earlier results file to compare against.")
+
+    def handle(self, *args, **options):
+        # Never touch the configured database or cache; emails go to the locmem backend
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with isolated_cache():
+                admin, groups = generate_dataset(
+                    groups=options['groups'], users=options['users'],
+                    entries=options['entries'], seed=options['seed'],
+                )
+                results = run_suite(
+                    admin, groups, repeat=options['repeat'], invites=options['invites'], seed=options['seed'],
+                )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'commit': self.git_commit(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': settings.DATABASES['default']['ENGINE'],
+            },
+            'dataset': {key: options[key] for key in ('groups', 'users', 'entries', 'repeat', 'invites', 'seed')},
+            'results': results,
+        }
+        Path(options['output']).write_text(json.dumps(report, indent=2))
+
+        for name, result in results.items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:24} p50 {latency['p50']:9.2f}ms  p95 {latency['p95']:9.2f}ms  "
+                f"{result['queries']:4} queries  {result['peak_memory_kib']:10.1f} KiB"
+            )
+        self.stdout.write(f"Wrote {options['output']}")
+
+        if options['compare']:
+            previous = json.loads(Path(options['compare']).read_text())['results']
+            for name, metrics in compare(results, previous).items():
+                changes = '  '.join(
+                    f"{metric} {old} -> {new} ({change:+.0%})" for metric, (old, new, change) in metrics.items()
+                )
+                self.stdout.write(f"{name:24} {changes}")
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
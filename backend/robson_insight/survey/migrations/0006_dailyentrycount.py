@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_merge_20240929_2048'),
+        ('survey', '0005_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEntryCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('classification', models.CharField(choices=[('1', 'Group 1'), ('2', 'Group 2'), ('3', 'Group 3'), ('4', 'Group 4'), ('5.1', 'Group 5.1'), ('5.2', 'Group 5.2'), ('6', 'Group 6'), ('7', 'Group 7'), ('8', 'Group 8'), ('9', 'Group 9'), ('10', 'Group 10')], max_length=100)),
+                ('csection', models.BooleanField()),
+                ('count', models.IntegerField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_counts', to='users.group')),
+            ],
+            options={
+                'unique_together': {('group', 'date', 'classification', 'csection')},
+            },
+        ),
+    ]
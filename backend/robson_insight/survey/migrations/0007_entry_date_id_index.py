@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0006_dailyentrycount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['date', 'id'], name='survey_entry_date_id_idx'),
+        ),
+    ]
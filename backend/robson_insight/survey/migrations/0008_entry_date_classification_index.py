@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0007_entry_date_id_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['date', 'classification', 'csection'], name='survey_entry_date_cls_cs_idx'),
+        ),
+        # The auto-created Entry.groups table only has (entry_id, group_id) and
+        # single-column indexes; groups__in lookups start from the group side.
+        migrations.RunSQL(
+            sql='CREATE INDEX "survey_entrygroups_grp_ent_idx" ON "survey_entry_groups" ("group_id", "entry_id");',
+            reverse_sql='DROP INDEX "survey_entrygroups_grp_ent_idx";',
+        ),
+    ]
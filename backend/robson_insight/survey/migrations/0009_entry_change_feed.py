@@ -0,0 +1,59 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:08
+
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def number_existing_entries(apps, schema_editor):
+    # Give existing entries distinct positions in the feed, in id order
+    Entry = apps.get_model('survey', 'Entry')
+    ChangeSequence = apps.get_model('survey', 'ChangeSequence')
+    Entry.objects.update(change_seq=F('id'))
+    last = Entry.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    ChangeSequence.objects.create(pk=1, value=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_invite_indexes'),
+        ('survey', '0008_entry_date_classification_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EntryTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['change_seq'], name='survey_entry_change_seq_idx'),
+        ),
+        migrations.AddField(
+            model_name='entrytombstone',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entry_tombstones', to='users.group'),
+        ),
+        migrations.RunPython(number_existing_entries, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='entrytombstone',
+            index=models.Index(fields=['group', 'change_seq'], name='survey_tombstone_grp_seq_idx'),
+        ),
+    ]
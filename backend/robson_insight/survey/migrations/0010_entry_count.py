@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:33
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0009_entry_change_feed'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='entry',
+            name='survey_entry_date_cls_cs_idx',
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='count',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['date', 'classification', 'csection', 'count'], name='survey_entry_date_cls_cs_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0010_entry_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyentrycount',
+            index=models.Index(fields=['group', 'date', 'classification', 'csection', 'count'], name='survey_daily_grp_date_cov_idx'),
+        ),
+    ]
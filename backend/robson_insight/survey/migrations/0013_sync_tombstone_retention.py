@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-18 22:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0012_export_job_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changesequence',
+            name='pruned',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='entrytombstone',
+            name='created_on',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='entrytombstone',
+            index=models.Index(fields=['created_on'], name='survey_tombstone_created_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 
 from users.models import Group, User
@@ -35,12 +37,103 @@ class Entry(models.Model):
     date = models.DateTimeField(
         default=timezone.now,
     )
+    # Number of births this row stands for; uploads store one weighted row per sheet cell
+    count = models.PositiveIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+    )
+    # Position in the change feed read by the incremental sync endpoint
+    change_seq = models.BigIntegerField(
+        default=0,
+    )
 
     def __str__(self):
         return f'{self.pk} {self.classification} {self.user}'
 
+    def save(self, *args, **kwargs):
+        # Take the sequence number in the same transaction as the write, so a
+        # reader that sees the counter at N also sees every row up to N.
+        with transaction.atomic():
+            self.change_seq = ChangeSequence.allocate()[-1]
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'change_seq'}
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name_plural = "Entries"
+        indexes = [
+            # Keyset pagination over (date, id)
+            models.Index(fields=['date', 'id'], name='survey_entry_date_id_idx'),
+            # Date-range scans that sum counts by classification/csection without reading the table
+            models.Index(fields=['date', 'classification', 'csection', 'count'], name='survey_entry_date_cls_cs_idx'),
+            models.Index(fields=['change_seq'], name='survey_entry_change_seq_idx'),
+        ]
+
+
+class ChangeSequence(models.Model):
+    """
+    Single-row counter handing out ``Entry.change_seq`` values. Allocating
+    locks the row until the surrounding transaction commits, so numbers
+    become visible in order.
+    """
+    value = models.BigIntegerField(
+        default=0,
+    )
+    # Tombstones up to this number have been pruned
+    pruned = models.BigIntegerField(
+        default=0,
+    )
+
+    @classmethod
+    def allocate(cls, count=1):
+        """Reserve ``count`` consecutive numbers; call inside a transaction."""
+        if not cls.objects.filter(pk=1).update(value=F('value') + count):
+            cls.objects.bulk_create([cls(pk=1, value=0)], ignore_conflicts=True)
+            cls.objects.filter(pk=1).update(value=F('value') + count)
+        value = cls.objects.values_list('value', flat=True).get(pk=1)
+        return range(value - count + 1, value + 1)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.values_list('value', flat=True).filter(pk=1).first() or 0
+
+    @classmethod
+    def pruned_through(cls):
+        return cls.objects.values_list('pruned', flat=True).filter(pk=1).first() or 0
+
+    @classmethod
+    def mark_pruned(cls, seq):
+        cls.objects.bulk_create([cls(pk=1, value=0)], ignore_conflicts=True)
+        cls.objects.filter(pk=1, pruned__lt=seq).update(pruned=seq)
+
+
+class EntryTombstone(models.Model):
+    """
+    Records that an entry left a group, by deletion or by having the link
+    removed, so sync clients scoped to that group can drop it. Tombstones
+    older than ``ROBSON_SYNC_TOMBSTONE_DAYS`` are pruned by
+    ``prune_sync_tombstones``.
+    """
+    entry_id = models.BigIntegerField()
+    group = models.ForeignKey(
+        to=Group,
+        on_delete=models.CASCADE,
+        related_name='entry_tombstones',
+    )
+    change_seq = models.BigIntegerField()
+    created_on = models.DateTimeField(
+        default=timezone.now,
+    )
+
+    def __str__(self):
+        return f'{self.entry_id} left {self.group} at {self.change_seq}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'change_seq'], name='survey_tombstone_grp_seq_idx'),
+            models.Index(fields=['created_on'], name='survey_tombstone_created_idx'),
+        ]
 
 
 class Filter(models.Model):
@@ -62,4 +155,86 @@ class Filter(models.Model):
         return f'{self.user.username} - Groups: {group_names} {self.pk}'
 
 
+class ExportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+    )
+    email = models.EmailField()
+    status = models.CharField(
+        choices=STATUSES,
+        max_length=10,
+        default=PENDING,
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+    )
+    error = models.TextField(
+        blank=True,
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+    )
+    lease_expires = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    created_on = models.DateTimeField(
+        auto_now_add=True,
+    )
+    finished_on = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
 
+    def __str__(self):
+        return f'{self.pk} {self.email} ({self.status})'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+
+class DailyEntryCount(models.Model):
+    """
+    Per-group daily rollup of entries, kept up to date by the signals in
+    ``survey.signals`` and the bulk upload path. Rebuild it with the
+    ``rebuild_entry_rollup`` management command.
+    """
+    group = models.ForeignKey(
+        to=Group,
+        on_delete=models.CASCADE,
+        related_name='daily_counts',
+    )
+    date = models.DateField()
+    classification = models.CharField(
+        choices=Entry.CLASSIFICATIONS,
+        max_length=100,
+    )
+    csection = models.BooleanField()
+    count = models.IntegerField(
+        default=0,
+    )
+
+    def __str__(self):
+        return f'{self.group} {self.date} {self.classification} {self.csection}: {self.count}'
+
+    class Meta:
+        unique_together = ('group', 'date', 'classification', 'csection')
+        indexes = [
+            # Date-range trends for a group read the counts from the index alone
+            models.Index(
+                fields=['group', 'date', 'classification', 'csection', 'count'], name='survey_daily_grp_date_cov_idx',
+            ),
+        ]
@@ -0,0 +1,114 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class EntryCursorPagination(BasePagination):
+    """
+    Keyset pagination over ``(date, id)``. Each page is a range scan on the
+    ``survey_entry_date_id_idx`` index starting after the previous page's last
+    row, so deep pages cost the same as the first one. Unlike DRF's
+    CursorPagination there is no offset for rows sharing a date, which matters
+    for uploads where thousands of entries share the quarter's end date.
+
+    Pagination is opt-in: without ``cursor`` or ``page_size`` the full list is
+    returned as before.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request):
+        """Async counterpart of ``paginate_queryset`` for plain Django async views."""
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        params = getattr(request, 'query_params', request.GET)
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(params)
+        position = self.decode_cursor(params.get(self.cursor_query_param))
+
+        queryset = queryset.order_by('date', 'id')
+        if position is not None:
+            date, pk = position
+            queryset = queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=pk))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        self.next_position = None
+        if self.has_next:
+            last = results[-1]
+            # Rows from values() querysets are dicts
+            self.next_position = (last['date'], last['id']) if isinstance(last, dict) else (last.date, last.pk)
+        return results
+
+    def get_page_size(self, params):
+        try:
+            page_size = int(params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            date, pk = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            date, pk = parse_datetime(date), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return date, pk
+
+    def encode_cursor(self, position):
+        date, pk = position
+        return urlsafe_b64encode(f'{date.isoformat()}|{pk}'.encode('ascii')).decode('ascii')
+
+    def get_next_cursor(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_data(self, data, results_key='results'):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('next_cursor', self.get_next_cursor()),
+            (results_key, data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
@@ -1,6 +1,6 @@
 from rest_framework import permissions
 from .models import Entry
-from users.models import UserProfile
+from users.memberships import get_memberships
 
 
 class CanReadEntry(permissions.BasePermission):
@@ -9,11 +9,9 @@ class CanReadEntry(permissions.BasePermission):
         
         pk = view.kwargs.get('pk')
         
-        try:
-            entry = Entry.objects.get(pk=pk)
-            user_profile = UserProfile.objects.get(user=request.user, group=entry.group)
-            return user_profile.can_view | user_profile.is_admin
-        except Entry.DoesNotExist:
-            return False
-        except UserProfile.DoesNotExist:
-            return False
\ No newline at end of file
+        memberships = get_memberships(request)
+        entry_groups = Entry.groups.through.objects.filter(entry_id=pk).values_list('group_id', flat=True)
+        return any(
+            memberships[group_id].can_view or memberships[group_id].is_admin
+            for group_id in entry_groups if group_id in memberships
+        )
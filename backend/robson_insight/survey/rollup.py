@@ -0,0 +1,116 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from robson_insight.cache import bump_versions
+from robson_insight.querylog import allow_repeated_queries
+
+from .models import DailyEntryCount, Entry
+
+
+def entry_day(value):
+    """The rollup day for an entry date, matching ``TruncDate`` in the current time zone."""
+    value = Entry._meta.get_field('date').to_python(value)
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def apply_deltas(deltas):
+    """
+    Add ``{(group_id, day, classification, csection): delta}`` to the rollup.
+    Missing rows are inserted first with a zero count, so concurrent writers
+    only ever race on the atomic ``count = count + delta`` updates.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    DailyEntryCount.objects.bulk_create(
+        [
+            DailyEntryCount(group_id=group_id, date=day, classification=classification, csection=csection)
+            for group_id, day, classification, csection in deltas
+        ],
+        ignore_conflicts=True,
+    )
+    with allow_repeated_queries():
+        for (group_id, day, classification, csection), delta in deltas.items():
+            DailyEntryCount.objects.filter(
+                group_id=group_id, date=day, classification=classification, csection=csection
+            ).update(count=F('count') + delta)
+
+
+def entry_deltas(entries, group_ids, sign=1):
+    deltas = Counter()
+    for entry in entries:
+        for group_id in group_ids:
+            deltas[(group_id, entry_day(entry.date), entry.classification, entry.csection)] += sign * entry.count
+    return deltas
+
+
+def sheet_deltas(rows, group_ids):
+    """Deltas for parsed upload cells, ``(classification, csection, date, count)``."""
+    deltas = Counter()
+    for classification, csection, date, count in rows:
+        for group_id in group_ids:
+            deltas[(group_id, entry_day(date), classification, csection)] += count
+    return deltas
+
+
+def _group_count_rows(group_id, start_date, end_date):
+    rows = DailyEntryCount.objects.filter(group_id=group_id)
+    if start_date:
+        rows = rows.filter(date__gte=entry_day(start_date))
+    if end_date:
+        rows = rows.filter(date__lte=entry_day(end_date))
+    return rows.values('classification', 'csection').annotate(total=Sum('count'))
+
+
+def counts_for_group(group_id, start_date=None, end_date=None):
+    """
+    ``{(classification, csection): count}`` for one group read from the rollup,
+    so the cost depends on the number of days rather than the number of entries.
+    """
+    rows = _group_count_rows(group_id, start_date, end_date)
+    return {(row['classification'], row['csection']): row['total'] for row in rows if row['total']}
+
+
+async def acounts_for_group(group_id, start_date=None, end_date=None):
+    rows = _group_count_rows(group_id, start_date, end_date)
+    return {(row['classification'], row['csection']): row['total'] async for row in rows if row['total']}
+
+
+def rebuild():
+    """
+    Recompute the whole rollup from ``Entry`` with one aggregated query, and
+    invalidate the cached results of every group it had or now has rows for.
+    """
+    EntryGroup = Entry.groups.through
+    rows = (
+        EntryGroup.objects
+        .annotate(day=TruncDate('entry__date'))
+        .values('group_id', 'day', 'entry__classification', 'entry__csection')
+        .annotate(total=Sum('entry__count'))
+        .order_by()
+    )
+    with transaction.atomic():
+        group_ids = set(DailyEntryCount.objects.values_list('group_id', flat=True).distinct())
+        DailyEntryCount.objects.all().delete()
+        created = DailyEntryCount.objects.bulk_create(
+            [
+                DailyEntryCount(
+                    group_id=row['group_id'],
+                    date=row['day'],
+                    classification=row['entry__classification'],
+                    csection=row['entry__csection'],
+                    count=row['total'],
+                )
+                for row in rows.iterator()
+            ],
+            batch_size=1000,
+        )
+        bump_versions('group', group_ids | {row.group_id for row in created})
+    return len(created)
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from .models import Entry, Filter
+from .models import Entry, ExportJob, Filter
 from users.models import Group
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -13,7 +13,9 @@ class EntrySerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     class Meta:
         model = Entry
-        fields = ['id', 'username', 'classification', 'csection', 'date', 'groups']
+        fields = ['id', 'username', 'classification', 'csection', 'count', 'date', 'groups']
+        # Only uploads create weighted entries; one posted entry is one birth
+        read_only_fields = ['count']
         # cursed but unsure otherwise
     def __init__(self, *args, **kwargs):
         # Remove 'groups' field if specified in context
@@ -32,4 +34,10 @@ class FilterSerializer(serializers.ModelSerializer):
 class FilterIDSerializer(serializers.ModelSerializer):
     class Meta:
         model = Filter
-        fields = ['id']
\ No newline at end of file
+        fields = ['id']
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'email', 'status', 'attempts', 'error', 'created_on', 'finished_on']
@@ -0,0 +1,108 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from robson_insight.cache import bump_version, bump_versions
+from . import rollup, sync
+from .models import Entry, Filter
+
+
+@receiver(m2m_changed, sender=Entry.groups.through)
+def update_rollup_on_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    sign = 1 if action == 'post_add' else -1
+
+    if action == 'pre_clear':
+        # Read the current links before they are removed
+        if reverse:
+            pk_set = set(instance.entries.values_list('pk', flat=True))
+        else:
+            pk_set = set(instance.groups.values_list('pk', flat=True))
+    if not pk_set:
+        return
+
+    if reverse:
+        entries = Entry.objects.filter(pk__in=pk_set)
+        rollup.apply_deltas(rollup.entry_deltas(entries, [instance.pk], sign))
+        bump_version('group', instance.pk)
+    else:
+        rollup.apply_deltas(rollup.entry_deltas([instance], pk_set, sign))
+        bump_versions('group', pk_set)
+
+
+@receiver(pre_save, sender=Entry)
+def update_rollup_on_entry_changed(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    try:
+        previous = Entry.objects.get(pk=instance.pk)
+    except Entry.DoesNotExist:
+        return
+
+    if (
+        previous.classification == instance.classification
+        and previous.csection == instance.csection
+        and previous.count == instance.count
+        and rollup.entry_day(previous.date) == rollup.entry_day(instance.date)
+    ):
+        return
+
+    group_ids = list(previous.groups.values_list('pk', flat=True))
+    deltas = rollup.entry_deltas([previous], group_ids, -1)
+    deltas.update(rollup.entry_deltas([instance], group_ids, 1))
+    rollup.apply_deltas(deltas)
+    bump_versions('group', group_ids)
+
+
+@receiver(pre_delete, sender=Entry)
+def update_rollup_on_entry_deleted(sender, instance, **kwargs):
+    # The through rows are removed without m2m_changed, so account for them here
+    group_ids = list(instance.groups.values_list('pk', flat=True))
+    rollup.apply_deltas(rollup.entry_deltas([instance], group_ids, -1))
+    bump_versions('group', group_ids)
+
+
+@receiver(post_save, sender=Filter)
+@receiver(post_delete, sender=Filter)
+def bump_filter_version_on_changed(sender, instance, **kwargs):
+    bump_version('filter', instance.pk)
+
+
+@receiver(m2m_changed, sender=Filter.groups.through)
+def bump_filter_version_on_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        bump_version('filter', instance.pk)
+    elif action == 'pre_clear':
+        bump_versions('filter', instance.filters.values_list('pk', flat=True))
+    elif pk_set:
+        bump_versions('filter', pk_set)
+
+
+@receiver(m2m_changed, sender=Entry.groups.through)
+def record_sync_changes_on_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if action == 'pre_clear':
+        if reverse:
+            pk_set = set(instance.entries.values_list('pk', flat=True))
+        else:
+            pk_set = set(instance.groups.values_list('pk', flat=True))
+    if not pk_set:
+        return
+
+    entry_ids, group_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    # Runs inside the m2m manager's transaction, so the new sequence number
+    # commits together with the link change.
+    seq = sync.touch_entries(entry_ids)
+    if action != 'post_add':
+        sync.record_departures(entry_ids, group_ids, seq)
+
+
+@receiver(pre_delete, sender=Entry)
+def record_sync_tombstones_on_entry_deleted(sender, instance, **kwargs):
+    group_ids = list(instance.groups.values_list('pk', flat=True))
+    if group_ids:
+        sync.record_departures([instance.pk], group_ids)
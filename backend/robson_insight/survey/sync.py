@@ -0,0 +1,161 @@
+"""
+Change feed behind the incremental sync endpoint.
+
+Every write to an entry or its group links moves the entry to a new
+``change_seq``. Removing an entry from a group, or deleting it, also leaves an
+``EntryTombstone`` per group. A client's sync token records the last sequence
+number it has seen and a fingerprint of the groups it was scoped to, so the
+next request only has to read what changed since.
+
+Tombstones are kept for ``ROBSON_SYNC_TOMBSTONE_DAYS``. A client whose copy
+is older than the newest pruned tombstone gets the full list again.
+"""
+import hashlib
+import logging
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ChangeSequence, Entry, EntryTombstone
+
+
+logger = logging.getLogger(__name__)
+
+SYNC_PAGE_SIZE = 1000
+MAX_SYNC_PAGE_SIZE = 5000
+PRUNE_BATCH_SIZE = 1000
+
+SyncPage = namedtuple('SyncPage', ['entries', 'deleted', 'seq', 'has_more', 'reset', 'floor'])
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def scope_fingerprint(group_ids):
+    return hashlib.sha1(','.join(str(pk) for pk in sorted(group_ids)).encode()).hexdigest()[:16]
+
+
+def encode_token(seq, fingerprint, floor=None):
+    """
+    ``floor`` is the number the client's copy is complete up to, when that
+    isn't ``seq``: while the full list is paged, the head it was read at.
+    """
+    parts = [seq, fingerprint] if floor is None or floor == seq else [seq, fingerprint, floor]
+    return urlsafe_b64encode('|'.join(str(part) for part in parts).encode('ascii')).decode('ascii')
+
+
+def decode_token(token):
+    """``(seq, fingerprint, floor)`` from a token, raising InvalidSyncToken if it is malformed."""
+    try:
+        seq, fingerprint, *floor = urlsafe_b64decode(token.encode('ascii')).decode('ascii').split('|')
+        if len(floor) > 1:
+            raise ValueError(token)
+        return int(seq), fingerprint, int(floor[0]) if floor else int(seq)
+    except (TypeError, ValueError) as e:
+        raise InvalidSyncToken('Invalid sync token') from e
+
+
+def touch_entries(entry_ids, seq=None):
+    """Move entries to the head of the feed; call inside a transaction."""
+    if seq is None:
+        seq = ChangeSequence.allocate()[-1]
+    Entry.objects.filter(pk__in=entry_ids).update(change_seq=seq)
+    return seq
+
+
+def record_departures(entry_ids, group_ids, seq=None):
+    """Leave a tombstone for every ``(entry, group)`` pair; call inside a transaction."""
+    if seq is None:
+        seq = ChangeSequence.allocate()[-1]
+    EntryTombstone.objects.bulk_create([
+        EntryTombstone(entry_id=entry_id, group_id=group_id, change_seq=seq)
+        for entry_id in entry_ids
+        for group_id in group_ids
+    ])
+    return seq
+
+
+def changes_since(group_ids, since=None, page_size=SYNC_PAGE_SIZE, floor=None):
+    """
+    Entries in ``group_ids`` changed after ``since`` and the ids of entries
+    that left those groups, oldest change first. With ``since=None`` every
+    entry is returned and nothing is reported deleted. ``floor`` is the
+    number the client's copy is complete up to (``since`` unless a full list
+    is being paged); if tombstones after it have been pruned, the full list
+    is returned instead, with ``reset`` set.
+
+    Returns a ``SyncPage`` whose ``seq`` and ``floor`` go in the next token.
+    """
+    if floor is None:
+        floor = since
+    head = seq = ChangeSequence.current()
+    queryset = Entry.objects.filter(
+        groups__in=group_ids, change_seq__lte=seq
+    ).distinct().select_related('user').order_by('change_seq', 'id')
+    if since is not None:
+        queryset = queryset.filter(change_seq__gt=since)
+
+    entries = list(queryset[:page_size + 1])
+    has_more = len(entries) > page_size
+    if has_more:
+        # Several entries can share a sequence number; never split one
+        # across pages, or the client would skip the rest of it.
+        last_seq = entries[page_size - 1].change_seq
+        entries = [entry for entry in entries[:page_size] if entry.change_seq < last_seq]
+        if not entries:
+            entries = list(queryset.filter(change_seq=last_seq))
+            seq = last_seq
+        else:
+            seq = entries[-1].change_seq
+
+    deleted = []
+    if since is not None:
+        departed = set(EntryTombstone.objects.filter(
+            group_id__in=group_ids, change_seq__gt=since, change_seq__lte=seq
+        ).values_list('entry_id', flat=True))
+        # Read after the tombstones: pruning marks before it deletes
+        if floor < ChangeSequence.pruned_through():
+            return changes_since(group_ids, None, page_size)
+        if departed:
+            # An entry that left one group may still be visible through another
+            still_visible = set(Entry.objects.filter(
+                pk__in=departed, groups__in=group_ids
+            ).values_list('pk', flat=True))
+            deleted = sorted(departed - still_visible)
+
+    listing = since is None or floor != since
+    if since is None:
+        floor = head
+    # Incremental pages, and the last page of a full list, leave the client complete up to ``seq``
+    return SyncPage(entries, deleted, seq, has_more, since is None, floor if listing and has_more else seq)
+
+
+def prune_tombstones(days=None, batch_size=PRUNE_BATCH_SIZE):
+    """
+    Delete tombstones older than ``days`` (default ``ROBSON_SYNC_TOMBSTONE_DAYS``)
+    in batches, after recording the newest pruned number so that clients
+    behind it resync in full. Returns how many tombstones were removed.
+    """
+    if days is None:
+        days = getattr(settings, 'ROBSON_SYNC_TOMBSTONE_DAYS', 90)
+    cutoff = timezone.now() - timedelta(days=days)
+    through = EntryTombstone.objects.filter(created_on__lt=cutoff).aggregate(seq=Max('change_seq'))['seq']
+    if through is None:
+        return 0
+
+    ChangeSequence.mark_pruned(through)
+    removed = 0
+    while True:
+        batch = list(
+            EntryTombstone.objects.filter(change_seq__lte=through).values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            break
+        removed += EntryTombstone.objects.filter(pk__in=batch).delete()[0]
+    logger.info("Pruned %d sync tombstones up to change %d", removed, through)
+    return removed
@@ -1,3 +1,1372 @@
-from django.test import TestCase
+import io
+import random
+from datetime import date, datetime, timedelta
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Prefetch, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 # Create your tests here.
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from django.contrib.auth.models import User
+from openpyxl import load_workbook
+from robson_insight.cache import get_version
+from robson_insight.metrics import registry
+from robson_insight.querylog import (
+    QueryDiagnosticsMiddleware, RepeatedQueries, allow_repeated_queries, capture_queries, fingerprint,
+)
+from users.models import Group, UserProfile
+from . import analytics, rollup
+from .async_views import AsyncEntryListView, AsyncEntrySummaryView, AsyncFilterDetailView
+from .benchmarks import generate_dataset, quarterly_csv, run_suite
+from .fast_serializers import entry_values, serialize_entries, serialize_entry_rows
+from .ingest import bulk_create_entries, parse_sheet, read_sheet
+from .jobs import MAX_ATTEMPTS, claim_next_job, run_job, run_pending_jobs
+from .models import DailyEntryCount, Entry, EntryTombstone, ExportJob, Filter
+from .renderers import ColumnarRenderer, epoch_days
+from .serializers import EntrySerializer
+from .sync import prune_tombstones
+
+
+class EntrySummaryViewTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.outsider = User.objects.create_user(username='outsider', password='outsiderpass')
+
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+        UserProfile.objects.create(user=self.user, group=self.other_group, can_view=True)
+
+        self.create_entries(self.group, '1', csection=False, count=3)
+        self.create_entries(self.group, '1', csection=True, count=1)
+        self.create_entries(self.group, '5.1', csection=True, count=4)
+        self.create_entries(self.other_group, '10', csection=False, count=2)
+
+        self.token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.outsider_token = self.client.post('/login/', {'username': 'outsider', 'password': 'outsiderpass'}).data['token']
+
+        self.url = reverse('survey:entry-summary')
+
+    def create_entries(self, group, classification, csection, count):
+        for _ in range(count):
+            entry = Entry.objects.create(user=self.user, classification=classification, csection=csection)
+            entry.groups.add(group)
+
+    def group_row(self, response, classification):
+        return next(row for row in response.data['groups'] if row['classification'] == classification)
+
+    def test_summary_counts_all_viewable_groups(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_responses'], 10)
+        self.assertEqual(response.data['total_csections'], 5)
+        self.assertEqual(response.data['cs_rate'], 50.0)
+        self.assertEqual(len(response.data['groups']), len(Entry.CLASSIFICATIONS))
+
+        group_1 = self.group_row(response, '1')
+        self.assertEqual(group_1['responses'], 4)
+        self.assertEqual(group_1['csection_count'], 1)
+        self.assertEqual(group_1['cs_rate'], 25.0)
+        self.assertEqual(group_1['group_size'], 40.0)
+        self.assertEqual(group_1['absolute_contribution'], 10.0)
+        self.assertEqual(group_1['relative_contribution'], 20.0)
+
+    def test_entry_in_several_groups_is_counted_once(self):
+        entry = Entry.objects.create(user=self.user, classification='2', csection=True)
+        entry.groups.set([self.group, self.other_group])
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get(self.url)
+        self.assertEqual(self.group_row(response, '2')['responses'], 1)
+
+    def test_summary_scoped_to_group_and_filter(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get(reverse('survey:entry-summary-scoped', args=[f'group-{self.other_group.id}']))
+        self.assertEqual(response.data['total_responses'], 2)
+
+        user_filter = Filter.objects.create(name='Only test group', user=self.user)
+        user_filter.groups.add(self.group)
+        response = self.client.get(reverse('survey:entry-summary-scoped', args=[f'filter-{user_filter.id}']))
+        self.assertEqual(response.data['total_responses'], 8)
+
+    def test_summary_date_range(self):
+        Entry.objects.filter(classification='5.1').update(date='2020-01-15T12:00:00Z')
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get(self.url, {'start_date': '2020-01-01', 'end_date': '2020-01-31'})
+        self.assertEqual(response.data['total_responses'], 4)
+
+        response = self.client.get(self.url, {'start_date': 'not-a-date'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_summary_for_group_without_permission(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.outsider_token)
+        response = self.client.get(reverse('survey:entry-summary-scoped', args=[f'group-{self.group.id}']))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_repeated_summary_is_served_from_cache(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.client.get(self.url)
+        # Only the token lookup: memberships and the table are both cached
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['total_responses'], 10)
+
+    def test_cached_summary_is_invalidated_by_changes(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        scoped_url = reverse('survey:entry-summary-scoped', args=[f'group-{self.other_group.id}'])
+        self.assertEqual(self.client.get(self.url).data['total_responses'], 10)
+        self.assertEqual(self.client.get(scoped_url).data['total_responses'], 2)
+
+        self.create_entries(self.other_group, '10', csection=True, count=1)
+        self.assertEqual(self.client.get(self.url).data['total_responses'], 11)
+        self.assertEqual(self.client.get(scoped_url).data['total_responses'], 3)
+
+        Entry.objects.filter(groups=self.other_group).first().delete()
+        self.assertEqual(self.client.get(scoped_url).data['total_responses'], 2)
+
+        profile = UserProfile.objects.get(user=self.user, group=self.other_group)
+        profile.can_view = False
+        profile.save()
+        self.assertEqual(self.client.get(scoped_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(self.url).data['total_responses'], 8)
+
+    def test_cached_filter_groups_follow_filter_changes(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        user_filter = Filter.objects.create(name='Mine', user=self.user)
+        user_filter.groups.add(self.group)
+        url = reverse('survey:entry-summary-scoped', args=[f'filter-{user_filter.id}'])
+        self.assertEqual(self.client.get(url).data['total_responses'], 8)
+
+        user_filter.groups.add(self.other_group)
+        self.assertEqual(self.client.get(url).data['total_responses'], 10)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.outsider_token)
+        self.assertEqual(self.client.get(url).data['total_responses'], 0)
+
+
+    def test_versions_bumped_again_on_commit(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        version = get_version('group', self.group.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Entry.objects.create(user=self.user, classification='2').groups.add(self.group)
+            bumped = get_version('group', self.group.pk)
+            self.assertNotEqual(bumped, version)
+            # A concurrent request caching the pre-commit rows here would use ``bumped``
+        for callback in callbacks:
+            callback()
+        self.assertNotIn(get_version('group', self.group.pk), (version, bumped))
+
+
+class EntryAnalyticsTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+        UserProfile.objects.create(user=self.user, group=self.other_group, can_view=True)
+
+        self.create_entry('1', False, '2024-01-15T10:00:00Z', [self.group])
+        self.create_entry('1', True, '2024-02-10T10:00:00Z', [self.group])
+        # Weighted and visible through both groups, so it must be counted once
+        self.create_entry('5.1', True, '2024-05-01T10:00:00Z', [self.group, self.other_group], count=3)
+        self.create_entry('10', False, '2024-06-30T10:00:00Z', [self.other_group])
+
+        token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+
+    def create_entry(self, classification, csection, date, groups, count=1):
+        entry = Entry.objects.create(
+            user=self.user, classification=classification, csection=csection, date=date, count=count,
+        )
+        entry.groups.set(groups)
+
+    def test_quarterly_trend_across_groups(self):
+        response = self.client.get(reverse('survey:entry-analytics'), {
+            'start_date': '2024-01-01', 'end_date': '2024-06-30',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data['periods'], ['2024-01-01', '2024-04-01'])
+        trend = data['trend']
+        self.assertEqual(trend['responses'][0], [2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(trend['responses'][1], [0, 0, 0, 0, 3, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(trend['csection_count'][1][4], 3)
+        self.assertEqual(trend['cs_rate'][0][0], 50.0)
+        self.assertEqual(trend['group_size'][1][4], 75.0)
+        self.assertEqual(trend['overall_cs_rate'], [50.0, 75.0])
+        self.assertEqual(trend['total_responses'], [2, 4])
+
+        summary = self.client.get(reverse('survey:entry-summary'), {
+            'start_date': '2024-01-01', 'end_date': '2024-06-30',
+        })
+        self.assertEqual(data['summary'], summary.data)
+
+    def test_single_group_reads_rollup(self):
+        url = reverse('survey:entry-analytics-scoped', args=[f'group-{self.group.pk}'])
+        response = self.client.get(url, {'period': 'month'})
+        self.assertEqual(response.data['periods'], ['2024-01-01', '2024-02-01', '2024-03-01', '2024-04-01', '2024-05-01'])
+        self.assertEqual(response.data['trend']['total_responses'], [1, 1, 0, 0, 3])
+        self.assertEqual(response.data['trend']['cs_rate'][2], [0.0] * len(Entry.CLASSIFICATIONS))
+        self.assertEqual(response.data['summary']['total_csections'], 4)
+
+    def test_invalid_period(self):
+        response = self.client.get(reverse('survey:entry-analytics'), {'period': 'fortnight'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_trends_by_fiscal_quarter(self):
+        response = self.client.get(reverse('survey:trends'), {'bucket': 'quarter'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data['periods'], ['2024-01-01', '2024-04-01'])
+        self.assertEqual(data['labels'], ['Q3 2023-24', 'Q4 2023-24'])
+        self.assertEqual(data['responses'][1], [0, 0, 0, 0, 3, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(data['csection_count'][0][0], 1)
+        self.assertEqual(data['cs_rate'][0][0], 50.0)
+        self.assertEqual(data['overall_cs_rate'], [50.0, 75.0])
+
+    def test_trends_from_rollup_and_entries(self):
+        scoped_url = reverse('survey:trends-scoped', args=[f'group-{self.group.pk}'])
+        for bucket, scoped, everything in (
+            ('week', [1, 1, 3], [1, 1, 3, 1]),
+            ('month', [1, 1, 3], [1, 1, 3, 1]),
+            ('year', [5], [6]),
+            ('fiscal_year', [5], [6]),
+        ):
+            with self.subTest(bucket=bucket):
+                response = self.client.get(scoped_url, {'bucket': bucket})
+                self.assertEqual(response.data['total_responses'], scoped)
+                response = self.client.get(reverse('survey:trends'), {'bucket': bucket})
+                self.assertEqual(response.data['total_responses'], everything)
+
+        fiscal = self.client.get(reverse('survey:trends'), {'bucket': 'fiscal_year'}).data
+        self.assertEqual(fiscal['periods'], ['2023-07-01'])
+        self.assertEqual(fiscal['labels'], ['2023-24'])
+        weekly = self.client.get(reverse('survey:trends'), {'bucket': 'week'}).data
+        self.assertEqual(weekly['periods'][0], '2024-01-15')
+        self.assertEqual(weekly['labels'][0], '2024-W03')
+
+    def test_trends_date_range_and_invalid_bucket(self):
+        response = self.client.get(reverse('survey:trends'), {
+            'bucket': 'month', 'start_date': '2024-02-01', 'end_date': '2024-05-31',
+        })
+        self.assertEqual(response.data['labels'], ['2024-02', '2024-05'])
+        self.assertEqual(response.data['total_responses'], [1, 3])
+
+        response = self.client.get(reverse('survey:trends'), {'bucket': 'decade'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_comparison_side_by_side(self):
+        third_group = Group.objects.create(name='Third Group')
+        UserProfile.objects.create(user=self.user, group=third_group, can_view=True)
+        user_filter = Filter.objects.create(name='Benchmark', user=self.user)
+        user_filter.groups.add(self.group, self.other_group, third_group)
+        url = reverse('survey:filter-comparison', args=[user_filter.pk])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rollup_reads = [query for query in queries if 'survey_dailyentrycount' in query['sql']]
+        self.assertEqual(len(rollup_reads), 1)
+
+        data = response.data
+        self.assertEqual(data['filter'], {'id': user_filter.pk, 'name': 'Benchmark'})
+        by_name = {group['name']: group for group in data['groups']}
+        self.assertEqual(by_name['Test Group']['total_responses'], 5)
+        self.assertEqual(by_name['Test Group']['total_csections'], 4)
+        self.assertEqual(by_name['Test Group']['groups'][0]['cs_rate'], 50.0)
+        self.assertEqual(by_name['Other Group']['total_responses'], 4)
+        self.assertEqual(by_name['Other Group']['cs_rate'], 75.0)
+        self.assertEqual(by_name['Third Group']['total_responses'], 0)
+        single = self.client.get(reverse('survey:entry-summary-scoped', args=[f'group-{self.group.pk}']))
+        self.assertEqual({k: v for k, v in by_name['Test Group'].items() if k not in ('id', 'name')}, single.data)
+
+        response = self.client.get(url, {'start_date': '2024-03-01'})
+        self.assertEqual([group['total_responses'] for group in response.data['groups']], [3, 4, 0])
+
+    def test_filter_comparison_requires_owner(self):
+        owner = User.objects.create_user(username='owner', password='ownerpass')
+        other_filter = Filter.objects.create(name='Not mine', user=owner)
+        response = self.client.get(reverse('survey:filter-comparison', args=[other_filter.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_trend_drops_rows_before_first_period(self):
+        starts = [date(2024, 1, 1), date(2024, 4, 1)]
+        days = analytics.to_epoch_days([date(2023, 12, 31), date(2024, 1, 1), date(2024, 9, 1)])
+        births, csections = analytics.robson_trend([0, 1, 2], [True, False, True], days, starts, weights=[5, 2, 7])
+        self.assertEqual(births[:, :3].tolist(), [[0, 2, 0], [0, 0, 7]])
+        self.assertEqual(csections[:, :3].tolist(), [[0, 0, 0], [0, 0, 7]])
+
+
+class EntryUploadTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader', password='uploaderpass')
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_add=True)
+        UserProfile.objects.create(user=self.user, group=self.other_group, can_add=True)
+
+        self.token = self.client.post('/login/', {'username': 'uploader', 'password': 'uploaderpass'}).data['token']
+        self.url = reverse('survey:entry-upload')
+
+    def upload(self, content, name='quarterly.csv'):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        file = SimpleUploadedFile(name, content.encode(), content_type='text/csv')
+        return self.client.post(self.url, {'file': file}, format='multipart')
+
+    QUARTERLY_CSV = (
+        "Robson report\n"
+        "Group Robson,Quarter 1: 1st July 2023 - 30th September 2023,,"
+        "Quarter 2: 1st October 2023 - 31st December 2023,,Final,\n"
+        ",Vaginal Delivery,C/Section,Vaginal Delivery,C/Section,Vaginal Delivery,C/Section\n"
+        "Group 1,3,1,,2,,\n"
+        "Group 5.1,0,4,1,,,\n"
+        "No Record,0,0,0,0,,\n"
+    )
+
+    def test_upload_csv_creates_weighted_entries_in_bulk(self):
+        # 9 queries for the upload (two of them reserve the sync sequence
+        # numbers), plus one rollup update per (sheet cell, group)
+        with self.assertNumQueries(9 + 5 * 2):
+            response = self.upload(self.QUARTERLY_CSV)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'message': '11 entries uploaded successfully.'})
+        # One entry per non-empty cell, weighted by the cell's value
+        self.assertEqual(Entry.objects.count(), 5)
+        self.assertEqual(Entry.objects.aggregate(total=Sum('count'))['total'], 11)
+        self.assertEqual(Entry.objects.get(classification='5.1', csection=True).count, 4)
+        self.assertEqual(Entry.groups.through.objects.count(), 10)
+        self.assertEqual(
+            Entry.objects.filter(date__year=2023, date__month=12).aggregate(total=Sum('count'))['total'], 3
+        )
+
+    @override_settings(ROBSON_WEIGHTED_UPLOADS=False)
+    def test_upload_can_create_one_entry_per_birth(self):
+        response = self.upload(self.QUARTERLY_CSV)
+
+        self.assertEqual(response.data, {'message': '11 entries uploaded successfully.'})
+        self.assertEqual(Entry.objects.count(), 11)
+        self.assertEqual(Entry.objects.filter(classification='5.1', csection=True).count(), 4)
+        self.assertEqual(Entry.groups.through.objects.count(), 22)
+
+    def test_weighted_upload_matches_expanded_summary(self):
+        for profile in UserProfile.objects.filter(user=self.user):
+            profile.can_view = True
+            profile.save()
+        self.upload(self.QUARTERLY_CSV)
+        weighted = self.client.get(reverse('survey:entry-summary')).data
+        Entry.objects.all().delete()
+
+        with self.settings(ROBSON_WEIGHTED_UPLOADS=False):
+            self.upload(self.QUARTERLY_CSV)
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('survey:entry-summary')).data, weighted)
+        self.assertEqual(weighted['total_responses'], 11)
+
+    def test_upload_invalid_format(self):
+        response = self.upload("Group Robson,Something else,\nGroup 1,3,1\n")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Entry.objects.count(), 0)
+
+    def test_upload_rejects_non_numeric_counts(self):
+        response = self.upload(
+            "Group Robson,Quarter 1: 1st July 2023 - 30th September 2023,\n"
+            ",Vaginal Delivery,C/Section\n"
+            "Group 1,3,many\n"
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Entry.objects.count(), 0)
+
+    def test_posted_entry_is_one_birth(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.post('/survey/entries/', {'classification': '1', 'csection': True, 'count': 50})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(Entry.objects.get().count, 1)
+
+    def test_upload_skips_blank_rows(self):
+        header = (
+            "Group Robson,Quarter 1: 1st July 2023 - 30th September 2023,\n"
+            ",Vaginal Delivery,C/Section\n"
+        )
+        response = self.upload(header + "Group 1,3,1\n\n,,\nGroup 2,1,2\n\nTotal,7,3\n")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(Entry.objects.values_list('classification', 'csection', 'count')),
+            [('1', False, 3), ('1', True, 1), ('2', False, 1), ('2', True, 2)],
+        )
+
+        response = self.upload(header + "Group 1,3,1\nNotes,,\nGroup 2,1,2\n")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_upload_tolerates_ragged_rows(self):
+        response = self.upload(
+            "Robson report,,,,,\n"
+            "Group Robson,Quarter 1: 1st July 2023 - 30th September 2023,\n"
+            ",Vaginal Delivery,C/Section\n"
+            "Group 1,3\n"
+            "Group 2,1,2,,,,notes\n"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Entry.objects.aggregate(total=Sum('count'))['total'], 6)
+
+
+class DownloadSurveyCSVViewTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+
+        for classification in ['1', '2', '3']:
+            entry = Entry.objects.create(user=self.user, classification=classification, csection=True)
+            entry.groups.set([self.group, self.other_group])
+
+        self.token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.url = '/survey/download-survey-csv/'
+
+    def download(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get(self.url)
+        return response, b''.join(response.streaming_content).decode().splitlines()
+
+    def test_download_streams_csv(self):
+        response, lines = self.download()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(lines[0], 'id,classification,user,csection,count,date,groups')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith(f'{Entry.objects.order_by("pk").first().pk},1,viewer,True,'))
+        self.assertTrue(lines[1].endswith(',"Test Group, Other Group"'))
+
+    def test_download_query_count_does_not_grow_with_rows(self):
+        with self.assertNumQueries(3):
+            self.download()
+
+        for _ in range(20):
+            entry = Entry.objects.create(user=self.user, classification='4')
+            entry.groups.add(self.group)
+
+        with self.assertNumQueries(3):
+            self.download()
+
+
+class ExportJobTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+        entry = Entry.objects.create(user=self.user, classification='1')
+        entry.groups.add(self.group)
+
+        self.token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def enqueue(self):
+        response = self.client.get('/survey/download-survey-csv/', {'email': 'someone@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response.data['job_id']
+
+    def test_email_export_is_queued_and_sent_by_worker(self):
+        job_id = self.enqueue()
+        self.assertEqual(len(mail.outbox), 0)
+
+        response = self.client.get(reverse('survey:export-job', args=[job_id]))
+        self.assertEqual(response.data['status'], ExportJob.PENDING)
+
+        self.assertEqual(run_pending_jobs(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['someone@example.com'])
+        filename, content, _ = mail.outbox[0].attachments[0]
+        self.assertEqual(filename, 'survey_data.csv')
+        self.assertIn('Test Group', content)
+
+        response = self.client.get(reverse('survey:export-job', args=[job_id]))
+        self.assertEqual(response.data['status'], ExportJob.DONE)
+        self.assertEqual(response.data['attempts'], 1)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        job_id = self.enqueue()
+
+        with mock.patch('survey.jobs.send_export', side_effect=ConnectionError('SMTP down')):
+            self.assertEqual(run_pending_jobs(), 1)
+
+        job = ExportJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, ExportJob.PENDING)
+        self.assertEqual(job.error, 'SMTP down')
+        self.assertGreater(job.run_after, timezone.now())
+
+        # Not due yet, so the worker leaves it alone
+        self.assertEqual(run_pending_jobs(), 0)
+
+        ExportJob.objects.filter(pk=job_id).update(run_after=timezone.now())
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.DONE)
+        self.assertEqual(job.attempts, 2)
+
+    def test_job_left_running_is_reclaimed_after_lease(self):
+        job_id = self.enqueue()
+        # The worker dies after claiming the job
+        self.assertIsNotNone(claim_next_job())
+        self.assertEqual(run_pending_jobs(), 0)
+
+        ExportJob.objects.filter(pk=job_id).update(lease_expires=timezone.now())
+        self.assertEqual(run_pending_jobs(), 1)
+        job = ExportJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, ExportJob.DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNone(job.lease_expires)
+
+        job_id = self.enqueue()
+        ExportJob.objects.filter(pk=job_id).update(
+            status=ExportJob.RUNNING, attempts=MAX_ATTEMPTS, lease_expires=timezone.now(),
+        )
+        self.assertEqual(run_pending_jobs(), 1)
+        self.assertEqual(ExportJob.objects.get(pk=job_id).status, ExportJob.FAILED)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_outcome_of_a_reclaimed_job_is_not_saved(self):
+        job_id = self.enqueue()
+        slow = claim_next_job()
+        ExportJob.objects.filter(pk=job_id).update(lease_expires=timezone.now())
+        claim_next_job()
+
+        with self.assertLogs('survey.jobs', 'WARNING'):
+            run_job(slow)
+        job = ExportJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.attempts), (ExportJob.RUNNING, 2))
+        self.assertIsNotNone(job.lease_expires)
+
+    def test_invalid_email_is_not_queued(self):
+        response = self.client.get('/survey/download-survey-csv/', {'email': 'not-an-address'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_job_status_is_private(self):
+        job_id = self.enqueue()
+        User.objects.create_user(username='other', password='otherpass')
+        other_token = self.client.post('/login/', {'username': 'other', 'password': 'otherpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + other_token)
+        response = self.client.get(reverse('survey:export-job', args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DailyEntryCountTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+
+        self.token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+
+    def snapshot(self):
+        return sorted(
+            DailyEntryCount.objects.filter(count__gt=0)
+            .values_list('group_id', 'date', 'classification', 'csection', 'count')
+        )
+
+    def assertRollupMatchesRebuild(self):
+        incremental = self.snapshot()
+        rollup.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_signals_keep_rollup_in_sync(self):
+        first = Entry.objects.create(user=self.user, classification='1', date='2024-03-01T10:00:00Z')
+        first.groups.set([self.group, self.other_group])
+        second = Entry.objects.create(user=self.user, classification='1', date='2024-03-01T18:00:00Z')
+        second.groups.add(self.group)
+        self.assertEqual(DailyEntryCount.objects.get(group=self.group, classification='1').count, 2)
+        self.assertRollupMatchesRebuild()
+
+        second.csection = True
+        second.save()
+        first.groups.remove(self.other_group)
+        self.other_group.entries.add(second)
+        self.assertRollupMatchesRebuild()
+
+        first.groups.clear()
+        second.delete()
+        self.assertRollupMatchesRebuild()
+        self.assertEqual(self.snapshot(), [])
+
+    def test_upload_updates_rollup(self):
+        UserProfile.objects.create(user=self.user, group=self.other_group, can_add=True)
+        content = (
+            "Group Robson,Quarter 1: 1st July 2023 - 30th September 2023,\n"
+            ",Vaginal Delivery,C/Section\n"
+            "Group 2,5,7\n"
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        file = SimpleUploadedFile('quarterly.csv', content.encode(), content_type='text/csv')
+        self.client.post(reverse('survey:entry-upload'), {'file': file}, format='multipart')
+
+        self.assertEqual(
+            rollup.counts_for_group(self.other_group.id),
+            {('2', False): 5, ('2', True): 7},
+        )
+        self.assertRollupMatchesRebuild()
+
+    def test_rebuild_invalidates_cached_summaries(self):
+        entry = Entry.objects.create(user=self.user, classification='3')
+        entry.groups.add(self.group)
+        DailyEntryCount.objects.update(count=0)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('survey:entry-summary-scoped', args=[f'group-{self.group.id}'])
+        self.assertEqual(self.client.get(url).data['total_responses'], 0)
+        rollup.rebuild()
+        self.assertEqual(self.client.get(url).data['total_responses'], 1)
+
+    def test_group_summary_reads_rollup(self):
+        for day in ['2024-01-10T08:00:00Z', '2024-02-10T08:00:00Z']:
+            entry = Entry.objects.create(user=self.user, classification='3', csection=True, date=day)
+            entry.groups.add(self.group)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('survey:entry-summary-scoped', args=[f'group-{self.group.id}'])
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'start_date': '2024-02-01', 'end_date': '2024-02-29'})
+        self.assertEqual(response.data['total_responses'], 1)
+        self.assertEqual(response.data['total_csections'], 1)
+
+
+class GenerateQuarterlyXLSXTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+        UserProfile.objects.create(user=self.user, group=self.other_group, can_view=True)
+
+        self.create_entries(self.group, '1', False, '2023-08-15T10:00:00Z', 3)
+        self.create_entries(self.group, '1', True, '2023-08-15T10:00:00Z', 2)
+        self.create_entries(self.group, '5.2', True, '2024-06-30T23:00:00Z', 1)
+        self.create_entries(self.other_group, '10', False, '2024-01-01T00:00:00Z', 4)
+        # Outside fiscal year 2023
+        self.create_entries(self.group, '1', False, '2024-07-01T00:00:00Z', 5)
+
+        self.token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.url = '/survey/generate-quarterly-xlsx/'
+
+    def create_entries(self, group, classification, csection, date, count):
+        for _ in range(count):
+            entry = Entry.objects.create(user=self.user, classification=classification, csection=csection, date=date)
+            entry.groups.add(group)
+
+    def download(self, **params):
+        response = self.client.get(self.url, {'populate': 'true', 'fiscal_year': 2023, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def rows(self, response):
+        sheet = load_workbook(io.BytesIO(response.content)).active
+        return {row[0]: row[1:] for row in sheet.iter_rows(min_row=3, values_only=True)}, sheet
+
+    def test_populated_sheet_counts(self):
+        rows, sheet = self.rows(self.download())
+
+        self.assertEqual(sheet['B1'].value, 'Quarter 1: 1st July 2023 - 30th September 2023')
+        self.assertIn('B1:C1', [str(merged) for merged in sheet.merged_cells.ranges])
+        self.assertEqual(sheet.column_dimensions['B'].width, len(sheet['B1'].value) + 2)
+
+        self.assertEqual(rows['Group 1'], (3, 2, 0, 0, 0, 0, 0, 0, 3, 2))
+        self.assertEqual(rows['Group 5.2'], (0, 0, 0, 0, 0, 0, 0, 1, 0, 1))
+        self.assertEqual(rows['Group 10'], (0, 0, 0, 0, 4, 0, 0, 0, 4, 0))
+        self.assertEqual(rows['Total'], (3, 2, 0, 0, 4, 0, 0, 1, 7, 3))
+
+    def test_fiscal_year_out_of_range(self):
+        for fiscal_year in ('soon', 0, 9999, 10000):
+            with self.subTest(fiscal_year=fiscal_year):
+                response = self.client.get(self.url, {'populate': 'true', 'fiscal_year': fiscal_year})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for fiscal_year in (1, 9998):
+            self.download(fiscal_year=fiscal_year)
+
+    def test_populated_sheet_scoped_to_group(self):
+        rows, _ = self.rows(self.download(scope=f'group-{self.other_group.id}'))
+        self.assertEqual(rows['Group 1'], (0,) * 10)
+        self.assertEqual(rows['Total'], (0, 0, 0, 0, 4, 0, 0, 0, 4, 0))
+
+    def test_populated_sheet_can_be_uploaded_again(self):
+        response = self.download()
+        file = io.BytesIO(response.content)
+        file.name = 'quarterly.xlsx'
+        cells = {(classification, csection, date.month): count for classification, csection, date, count in parse_sheet(read_sheet(file))}
+        self.assertEqual(cells, {('1', False, 9): 3, ('1', True, 9): 2, ('10', False, 3): 4, ('5.2', True, 6): 1})
+
+    def test_template_is_unchanged_without_populate(self):
+        response = self.client.get(self.url)
+        sheet = load_workbook(io.BytesIO(response.content)).active
+        self.assertEqual(sheet['B3'].value, 0)
+        self.assertTrue(str(sheet['J3'].value).startswith('=SUMPRODUCT'))
+
+
+class EntryPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+
+        # Many entries share a date, as they do after a quarterly upload
+        for index in range(25):
+            date = '2024-03-31T00:00:00Z' if index < 20 else f'2024-04-0{index - 19}T00:00:00Z'
+            entry = Entry.objects.create(user=self.user, classification='1', date=date)
+            entry.groups.set([self.group, self.other_group])
+
+        self.token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def collect(self, url, page_size, queries):
+        # The membership map is cached by the first request, so later pages
+        # only pay for the token lookup and the page itself.
+        ids = []
+        response = self.client.get(url, {'page_size': page_size})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(entry['id'] for entry in response.data['results'])
+            if response.data['next'] is None:
+                return ids
+            with self.assertNumQueries(queries):
+                response = self.client.get(response.data['next'])
+
+    def test_entry_list_walks_every_entry_once(self):
+        ids = self.collect('/survey/entries/', page_size=7, queries=3)
+        self.assertEqual(ids, list(Entry.objects.order_by('date', 'id').values_list('id', flat=True)))
+
+    def test_filter_list_pages(self):
+        ids = self.collect(f'/survey/entries/filter/group-{self.group.id}/', page_size=10, queries=2)
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_unpaginated_list_is_unchanged(self):
+        response = self.client.get(f'/survey/entries/filter/group-{self.group.id}/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 25)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/survey/entries/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_entries_by_date_pages(self):
+        url = '/survey/filter-entries-by-date/'
+        data = {'start_date': '2024-03-01', 'end_date': '2024-04-30'}
+        ids = []
+        cursor = None
+        while True:
+            params = '?page_size=10' + (f'&cursor={cursor}' if cursor else '')
+            with self.assertNumQueries(3 if cursor else 4):
+                response = self.client.post(url + params, data)
+            body = response.json()
+            ids.extend(entry['id'] for entry in body['entries'])
+            self.assertEqual(body['entries'][0]['groups'], ['Test Group', 'Other Group'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(len(set(ids)), 25)
+
+        response = self.client.post(url, data)
+        self.assertEqual(len(response.json()['entries']), 25)
+
+
+class EntrySyncTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+        UserProfile.objects.create(user=self.user, group=self.other_group, can_view=True)
+
+        self.entries = []
+        for index in range(4):
+            entry = Entry.objects.create(user=self.user, classification='1')
+            entry.groups.set([self.group])
+            self.entries.append(entry)
+
+        token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        self.url = reverse('survey:entry-sync')
+
+    def sync(self, token=None, url=None, **params):
+        if token:
+            params['token'] = token
+        response = self.client.get(url or self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def ids(self, body):
+        return sorted(entry['id'] for entry in body['entries'])
+
+    def test_first_sync_returns_everything(self):
+        body = self.sync()
+        self.assertTrue(body['reset'])
+        self.assertFalse(body['has_more'])
+        self.assertEqual(self.ids(body), [entry.pk for entry in self.entries])
+        self.assertEqual(body['deleted'], [])
+
+        body = self.sync(body['token'])
+        self.assertFalse(body['reset'])
+        self.assertEqual((body['entries'], body['deleted']), ([], []))
+
+    def test_only_changes_are_returned(self):
+        token = self.sync()['token']
+
+        created = Entry.objects.create(user=self.user, classification='2')
+        created.groups.set([self.group])
+        edited = self.entries[0]
+        edited.csection = True
+        edited.save()
+        deleted_pk = self.entries[1].pk
+        self.entries[1].delete()
+
+        body = self.sync(token)
+        self.assertEqual(self.ids(body), sorted([created.pk, edited.pk]))
+        self.assertEqual(body['deleted'], [deleted_pk])
+        self.assertEqual(self.sync(body['token'])['entries'], [])
+
+    def test_entry_leaving_the_scope_is_deleted(self):
+        entry = self.entries[0]
+        entry.groups.add(self.other_group)
+        scoped_url = reverse('survey:entry-sync-scoped', args=[f'group-{self.group.id}'])
+        scoped_token = self.sync(url=scoped_url)['token']
+        token = self.sync()['token']
+
+        entry.groups.remove(self.group)
+        self.assertEqual(self.sync(scoped_token, scoped_url)['deleted'], [entry.pk])
+        # Still visible through the other group, so it is updated rather than deleted
+        body = self.sync(token)
+        self.assertEqual((self.ids(body), body['deleted']), ([entry.pk], []))
+
+    def test_pages_follow_the_token(self):
+        # Linking from the group's side gives these entries one shared sequence number
+        shared = [Entry.objects.create(user=self.user, classification='3') for _ in range(3)]
+        self.group.entries.add(*shared)
+
+        seen = []
+        body = {'token': None, 'has_more': True}
+        while body['has_more']:
+            body = self.sync(body['token'], page_size=2)
+            seen.extend(entry['id'] for entry in body['entries'])
+        self.assertEqual(sorted(seen), sorted(entry.pk for entry in self.entries + shared))
+
+    def test_changed_scope_resets(self):
+        token = self.sync()['token']
+        profile = UserProfile.objects.get(user=self.user, group=self.other_group)
+        profile.can_view = False
+        profile.save()
+        body = self.sync(token)
+        self.assertTrue(body['reset'])
+        self.assertEqual(len(body['entries']), 4)
+
+    def test_uploaded_entries_are_synced(self):
+        token = self.sync()['token']
+        bulk_create_entries(self.user, [('5.1', True, timezone.now(), 3)], [self.group.id])
+        entries = self.sync(token)['entries']
+        self.assertEqual([entry['count'] for entry in entries], [3])
+
+    def age_tombstones(self, days=100):
+        EntryTombstone.objects.update(created_on=timezone.now() - timedelta(days=days))
+
+    def test_pruned_tombstones_force_full_resync(self):
+        token = self.sync()['token']
+        self.entries[0].delete()
+        self.age_tombstones()
+        Entry.objects.create(user=self.user, classification='2').groups.set([self.group])
+        self.entries[1].delete()
+
+        self.assertEqual(prune_tombstones(), 1)
+        self.assertEqual(EntryTombstone.objects.count(), 1)
+        body = self.sync(token)
+        self.assertTrue(body['reset'])
+        self.assertEqual(len(body['entries']), 3)
+        self.assertEqual(body['deleted'], [])
+        self.assertFalse(self.sync(body['token'])['reset'])
+
+    def test_full_list_pages_past_pruned_tombstones(self):
+        departed = Entry.objects.create(user=self.user, classification='2')
+        departed.groups.set([self.group])
+        departed.delete()
+        self.age_tombstones()
+        out = io.StringIO()
+        call_command('prune_sync_tombstones', '--once', stdout=out)
+        self.assertIn('Removed 1 sync tombstone(s).', out.getvalue())
+
+        # Every page sits below the pruned number, but belongs to a listing read after it
+        seen = []
+        body = {'token': None, 'has_more': True}
+        for _ in range(5):
+            body = self.sync(body['token'], page_size=2)
+            seen.extend(entry['id'] for entry in body['entries'])
+            if not body['has_more']:
+                break
+        self.assertFalse(body['has_more'])
+        self.assertEqual(sorted(seen), [entry.pk for entry in self.entries])
+
+    def test_invalid_token(self):
+        response = self.client.get(self.url, {'token': 'not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastEntrySerializerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [User.objects.create_user(username=f'user{index}') for index in range(3)] + [None]
+        groups = [Group.objects.create(name=f'Group {index}') for index in range(3)]
+        for index in range(40):
+            entry = Entry.objects.create(
+                user=users[index % 4],
+                classification=Entry.CLASSIFICATIONS[index % 11][0],
+                csection=index % 3 == 0,
+                date=f'2024-05-{index % 28 + 1:02d}T{index % 24:02d}:{index:02d}:07.{index:06d}Z',
+            )
+            entry.groups.set(groups[:index % 3 + 1][::-1])
+        cls.queryset = Entry.objects.filter(groups__in=groups).distinct().order_by('date', 'id')
+
+    def drf(self, queryset, **kwargs):
+        queryset = queryset.select_related('user').prefetch_related(
+            Prefetch('groups', queryset=Group.objects.order_by('pk'))
+        )
+        return JSONRenderer().render(EntrySerializer(queryset, many=True, **kwargs).data)
+
+    def test_matches_entry_serializer(self):
+        self.assertEqual(JSONRenderer().render(serialize_entries(self.queryset)), self.drf(self.queryset))
+
+    def test_matches_entry_serializer_without_groups(self):
+        self.assertEqual(
+            JSONRenderer().render(serialize_entries(self.queryset, include_groups=False)),
+            self.drf(self.queryset, exclude_groups=True),
+        )
+
+    def test_page_of_rows_matches_entry_serializer(self):
+        rows = list(entry_values(self.queryset)[5:15])
+        self.assertEqual(JSONRenderer().render(serialize_entry_rows(rows)), self.drf(self.queryset[5:15]))
+
+    def test_query_count_is_constant(self):
+        with self.assertNumQueries(2):
+            serialize_entries(self.queryset)
+        with self.assertNumQueries(1):
+            serialize_entries(self.queryset, include_groups=False)
+
+
+class ColumnarRendererTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.colleague = User.objects.create_user(username='colleague', password='colleaguepass')
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+        self.hidden_group = Group.objects.create(name='Hidden Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+        UserProfile.objects.create(user=self.user, group=self.other_group, can_view=True)
+
+        for index in range(200):
+            entry = Entry.objects.create(
+                user=self.user if index % 3 else self.colleague,
+                classification=['1', '2', '5.1', '10'][index % 4],
+                csection=index % 5 == 0,
+                date=f'2024-{index % 12 + 1:02d}-{index % 28 + 1:02d}T{index % 24:02d}:30:00Z',
+            )
+            entry.groups.set([self.group] if index % 2 else [self.group, self.other_group])
+
+        token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+
+    def decode(self, table):
+        columns = table['columns']
+        rows = [{} for _ in range(table['count'])]
+        for field, column in columns.items():
+            if field == 'csection':
+                values = [bit == '1' for bit in column]
+            elif field == 'date':
+                values = [(date(1970, 1, 1) + timedelta(days=days)).isoformat() for days in column]
+            elif field == 'groups':
+                values = [[column['values'][code] for code in codes] for codes in column['codes']]
+            elif isinstance(column, dict):
+                values = [column['values'][code] for code in column['codes']]
+            else:
+                values = column
+            for row, value in zip(rows, values):
+                row[field] = value
+        return rows
+
+    def as_days(self, rows):
+        return [{**row, 'date': row['date'][:10]} for row in rows]
+
+    def test_format_param_matches_json(self):
+        json_rows = self.client.get('/survey/entries/').json()
+        response = self.client.get('/survey/entries/', {'format': 'columnar'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.robson.columnar+json')
+        self.assertEqual(self.decode(response.json()), self.as_days(json_rows))
+
+    def test_accept_header_with_pagination(self):
+        url = f'/survey/entries/filter/group-{self.group.id}/'
+        json_page = self.client.get(url, {'page_size': 50}).json()
+        response = self.client.get(url, {'page_size': 50}, HTTP_ACCEPT='application/vnd.robson.columnar+json')
+        body = response.json()
+        self.assertEqual(body['next_cursor'], json_page['next_cursor'])
+        self.assertEqual(self.decode(body['results']), self.as_days(json_page['results']))
+        self.assertEqual(body['results']['columns']['username']['values'], ['colleague', 'viewer'])
+
+    def test_sync_entries_are_columnar(self):
+        body = self.client.get('/survey/entries/sync/', {'format': 'columnar'}).json()
+        self.assertEqual(body['entries']['count'], 200)
+        self.assertEqual(body['deleted'], [])
+        self.assertTrue(body['reset'])
+
+    def test_payload_is_several_times_smaller(self):
+        json_size = len(self.client.get('/survey/entries/').content)
+        columnar_size = len(self.client.get('/survey/entries/', {'format': 'columnar'}).content)
+        self.assertLess(columnar_size * 3, json_size)
+
+    def test_columns_built_from_rows_match_renderer_encoding(self):
+        json_rows = self.client.get('/survey/entries/').json()
+        body = self.client.get('/survey/entries/', {'format': 'columnar'}).json()
+        self.assertEqual(body, ColumnarRenderer().to_columnar(json_rows))
+
+        with mock.patch.object(ColumnarRenderer, 'encode_rows') as encode_rows:
+            self.client.get('/survey/entries/', {'format': 'columnar', 'page_size': 50})
+        encode_rows.assert_not_called()
+
+    def test_filter_entries_by_date_is_columnar(self):
+        url = '/survey/filter-entries-by-date/'
+        data = {'start_date': '2024-03-01', 'end_date': '2024-04-30'}
+        json_body = self.client.post(url + '?page_size=20', data).json()
+        body = self.client.post(url + '?page_size=20&format=columnar', data).json()
+        self.assertEqual(body['next_cursor'], json_body['next_cursor'])
+        self.assertEqual(self.decode(body['entries']), self.as_days(json_body['entries']))
+        self.assertEqual(body['entries']['columns']['groups']['values'], ['Test Group', 'Other Group'])
+
+    @override_settings(TIME_ZONE='Australia/Sydney')
+    def test_columnar_days_agree_across_endpoints(self):
+        listed = self.client.get('/survey/entries/', {'format': 'columnar'}).json()['columns']
+        days = dict(zip(listed['id'], listed['date']))
+        body = self.client.post('/survey/filter-entries-by-date/?format=columnar', {}).json()
+        columns = body['entries']['columns']
+        self.assertEqual(len(columns['id']), 200)
+        self.assertEqual([days[pk] for pk in columns['id']], columns['date'])
+        # Entries logged from 13:30 UTC fall on the next day in Sydney
+        rows = self.client.post('/survey/filter-entries-by-date/', {}).json()['entries']
+        utc_days = epoch_days([row['date'] for row in rows])
+        self.assertNotEqual(utc_days, columns['date'])
+
+    def test_errors_are_not_encoded(self):
+        response = self.client.get(f'/survey/entries/filter/group-{self.hidden_group.id}/', {'format': 'columnar'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn('detail', response.json())
+
+
+class AsyncEndpointTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        self.group = Group.objects.create(name='Test Group')
+        self.other_group = Group.objects.create(name='Other Group')
+        self.hidden_group = Group.objects.create(name='Hidden Group')
+        UserProfile.objects.create(user=self.user, group=self.group, can_view=True)
+        UserProfile.objects.create(user=self.user, group=self.other_group, can_view=True)
+
+        for index in range(12):
+            entry = Entry.objects.create(
+                user=self.user, classification=['1', '2', '5.1'][index % 3], csection=index % 2 == 0,
+                date=f'2024-03-{index + 1:02d}T08:00:00Z',
+            )
+            entry.groups.set([self.group] if index % 4 else [self.group, self.other_group])
+        Entry.objects.create(user=self.user, classification='10').groups.set([self.hidden_group])
+
+        self.filter = Filter.objects.create(name='Both', user=self.user)
+        self.filter.groups.set([self.group, self.other_group])
+
+        token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+
+    def assertSameBody(self, sync_url, async_url, params=None):
+        sync_response = self.client.get(sync_url, params)
+        # Make the async view compute the result instead of reading the sync one from the cache
+        cache.clear()
+        async_response = self.client.get(async_url, params)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.json(), sync_response.json())
+        return async_response.json()
+
+    def test_summary_matches_sync_view(self):
+        body = self.assertSameBody('/survey/entries/summary/', '/survey/async/entries/summary/')
+        self.assertEqual(body['total_responses'], 12)
+        for scope in [f'group-{self.other_group.id}', f'filter-{self.filter.id}']:
+            self.assertSameBody(f'/survey/entries/summary/{scope}/', f'/survey/async/entries/summary/{scope}/')
+        self.assertSameBody(
+            '/survey/entries/summary/', '/survey/async/entries/summary/',
+            {'start_date': '2024-03-03', 'end_date': '2024-03-07'},
+        )
+
+    def test_views_are_async_and_dispatch_on_method(self):
+        for view in (AsyncEntryListView, AsyncEntrySummaryView, AsyncFilterDetailView):
+            self.assertTrue(view.view_is_async)
+        response = self.client.post('/survey/async/entries/')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_summary_errors_match_sync_view(self):
+        response = self.client.get(f'/survey/async/entries/summary/group-{self.hidden_group.id}/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/survey/async/entries/summary/', {'start_date': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_entry_list_matches_sync_view(self):
+        body = self.assertSameBody('/survey/entries/', '/survey/async/entries/')
+        self.assertEqual(len(body), 12)
+
+        cursor = None
+        while True:
+            params = {'page_size': 5, **({'cursor': cursor} if cursor else {})}
+            sync_body = self.client.get('/survey/entries/', params).json()
+            body = self.client.get('/survey/async/entries/', params).json()
+            self.assertEqual(body['results'], sync_body['results'])
+            self.assertEqual(body['next_cursor'], sync_body['next_cursor'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+            self.assertTrue(body['next'].startswith('http://testserver/survey/async/entries/'))
+
+    def test_filter_detail_matches_sync_view(self):
+        self.assertSameBody(f'/survey/filters/{self.filter.id}/', f'/survey/async/filters/{self.filter.id}/')
+
+        other_user = User.objects.create_user(username='other', password='otherpass')
+        other_filter = Filter.objects.create(name='Not mine', user=other_user)
+        response = self.client.get(f'/survey/async/filters/{other_filter.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_requires_token(self):
+        self.client.credentials()
+        response = self.client.get('/survey/async/entries/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION='Token not-a-token')
+        response = self.client.get('/survey/async/entries/summary/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_only_get_is_allowed(self):
+        response = self.client.post('/survey/async/entries/')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+@skipUnless(connection.vendor == 'sqlite', "Query plans are checked against SQLite's EXPLAIN output")
+class EntryIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='viewer')
+        cls.groups = [Group.objects.create(name=f'Group {index}') for index in range(5)]
+        entries = Entry.objects.bulk_create([
+            Entry(
+                user=user,
+                classification=Entry.CLASSIFICATIONS[index % len(Entry.CLASSIFICATIONS)][0],
+                csection=index % 3 == 0,
+                date=f'2024-{index % 12 + 1:02d}-01T00:00:00Z',
+            )
+            for index in range(500)
+        ])
+        Entry.groups.through.objects.bulk_create([
+            Entry.groups.through(entry_id=entry.pk, group_id=cls.groups[index % 5].pk)
+            for index, entry in enumerate(entries)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_group_lookup_uses_through_table_index(self):
+        plan = Entry.objects.filter(groups__in=[self.groups[0].pk]).explain()
+        self.assertIn('survey_entrygroups_grp_ent_idx', plan)
+
+    def test_date_range_aggregate_uses_covering_index(self):
+        plan = (
+            Entry.objects.filter(date__gte='2024-03-01T00:00:00Z', date__lte='2024-05-31T00:00:00Z')
+            .values('classification', 'csection').annotate(total=Sum('count')).explain()
+        )
+        self.assertIn('COVERING INDEX survey_entry_date_cls_cs_idx', plan)
+
+    def test_group_trend_reads_rollup_covering_index(self):
+        plan = analytics.bucket_rows([self.groups[0].pk], 'month', datetime(2015, 1, 1), datetime(2024, 12, 31)).explain()
+        self.assertIn('COVERING INDEX survey_daily_grp_date_cov_idx', plan)
+
+
+class BenchmarkSuiteTests(TestCase):
+
+    def test_generated_dataset_and_suite_run(self):
+        admin, groups = generate_dataset(groups=2, users=3, entries=200, seed=1)
+        self.assertEqual(Entry.objects.count(), 200)
+        self.assertTrue(DailyEntryCount.objects.filter(group=groups[0]).exists())
+
+        results = run_suite(admin, groups, repeat=2, invites=3)
+
+        self.assertEqual(set(results), {
+            'entries', 'entries_page', 'entries_filter', 'filter_entries_by_date',
+            'download_survey_csv', 'entries_upload', 'mass_invite',
+        })
+        for name, result in results.items():
+            self.assertLess(result['status'], 300, name)
+            self.assertGreater(result['queries'], 0, name)
+            self.assertEqual(set(result['latency_ms']), {'p50', 'p95', 'p99', 'mean'})
+        # Writes are rolled back after each run
+        self.assertEqual(Entry.objects.count(), 200)
+
+    def test_quarterly_csv_parses(self):
+        file = SimpleUploadedFile('quarterly.csv', quarterly_csv(400, random.Random(0)).encode())
+        rows = parse_sheet(read_sheet(file))
+        self.assertEqual({classification for classification, *_ in rows}, {value for value, _ in Entry.CLASSIFICATIONS})
+
+
+class MetricsMiddlewareTests(APITestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username='viewer', password='viewerpass')
+        group = Group.objects.create(name='Test Group')
+        UserProfile.objects.create(user=self.user, group=group, can_view=True)
+        entry = Entry.objects.create(user=self.user, classification='1', csection=False, date=timezone.now())
+        entry.groups.add(group)
+        token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        registry.reset()
+
+    def test_server_timing_header_reports_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/survey/entries/')
+
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_metrics_endpoint_exposes_sampled_requests(self):
+        self.client.get('/survey/entries/')
+        self.client.get('/survey/entries/')
+
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('robson_requests_total{view="survey:survey.views.EntryListView",method="GET",status="200"} 2', body)
+        self.assertIn('robson_db_queries_count{view="survey:survey.views.EntryListView",method="GET"} 2', body)
+        self.assertIn('# TYPE robson_request_duration_seconds histogram', body)
+        self.assertNotIn('view="metrics"', body)
+
+    def test_metrics_endpoint_is_local_only(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.8')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(ROBSON_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get('/survey/entries/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('EntryListView', registry.render())
+
+
+@override_settings(ROBSON_QUERY_DIAGNOSTICS='raise', ROBSON_REPEATED_QUERY_THRESHOLD=3)
+class QueryDiagnosticsTests(APITestCase):
+    """Every endpoint below must stay free of N+1 queries as the data grows."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', password='adminpass')
+        self.groups = [Group.objects.create(name=f'Group {index}') for index in range(3)]
+        for index, group in enumerate(self.groups):
+            UserProfile.objects.create(user=self.user, group=group, is_admin=True, can_view=True, can_add=True)
+            for member in range(3):
+                other = User.objects.create_user(username=f'member{index}-{member}')
+                UserProfile.objects.create(user=other, group=group, can_view=True)
+        for index in range(12):
+            entry = Entry.objects.create(
+                user=self.user, classification=str(index % 4 + 1), csection=index % 2 == 0, date=timezone.now(),
+            )
+            entry.groups.set(self.groups[:index % 3 + 1])
+        self.filter = Filter.objects.create(user=self.user, name='All')
+        self.filter.groups.set(self.groups)
+        token = self.client.post('/login/', {'username': 'admin', 'password': 'adminpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+
+    def test_survey_endpoints(self):
+        for url in (
+            '/survey/entries/',
+            f'/survey/entries/filter/{self.filter.pk}/',
+            '/survey/filters/',
+            '/survey/download-survey-csv/',
+            '/survey/generate-quarterly-xlsx/',
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+        response = self.client.post('/survey/filter-entries-by-date/', {'start_date': '2000-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_users_endpoints(self):
+        for url in (
+            '/users/groups/',
+            f'/users/get-groups-users/{self.groups[0].pk}/',
+            '/users/groups-can-view/',
+            '/users/invitations/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_repeated_queries_are_reported_with_their_origin(self):
+        def n_plus_one(request):
+            for entry in Entry.objects.all():
+                list(entry.groups.all())
+            return HttpResponse()
+
+        request = RequestFactory().get('/survey/entries/')
+        request.resolver_match = None
+        with self.assertLogs('robson_insight.querylog', 'WARNING'), self.assertRaises(RepeatedQueries) as raised:
+            QueryDiagnosticsMiddleware(n_plus_one)(request)
+        self.assertIn('12x from survey/tests.py:', str(raised.exception))
+        self.assertIn('in n_plus_one', str(raised.exception))
+
+    def test_async_chain_is_not_adapted(self):
+        async def view(request):
+            return HttpResponse()
+
+        middleware = QueryDiagnosticsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(async_to_sync(middleware)(RequestFactory().get('/')).status_code, 200)
+
+    def test_allowed_repeats_are_not_reported(self):
+        with capture_queries() as inspector:
+            for entry in Entry.objects.all():
+                with allow_repeated_queries():
+                    list(entry.groups.all())
+        self.assertEqual(len(inspector.queries), 13)
+        self.assertEqual(inspector.repeated(3), [])
+
+    def test_fingerprint_ignores_literals_and_in_list_length(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 1 AND b = 'x' AND c IN (%s, %s)"),
+            fingerprint("SELECT * FROM t WHERE a = 22 AND b = 'y' AND c IN (%s)"),
+        )
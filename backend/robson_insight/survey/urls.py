@@ -1,5 +1,6 @@
 from django.urls import path
 from .views import *
+from .async_views import AsyncEntryListView, AsyncEntrySummaryView, AsyncFilterDetailView
 
 
 app_name = 'survey'
@@ -7,14 +8,30 @@ urlpatterns = [
     path('entries/', EntryListView.as_view()),
     path('entries/filter/<str:pk>/', EntryFilterListView.as_view()),
     path('entries/upload/', EntryListView.as_view(), name='entry-upload'),
+    path('entries/summary/', EntrySummaryView.as_view(), name='entry-summary'),
+    path('entries/summary/<str:pk>/', EntrySummaryView.as_view(), name='entry-summary-scoped'),
+    path('entries/analytics/', EntryAnalyticsView.as_view(), name='entry-analytics'),
+    path('entries/analytics/<str:pk>/', EntryAnalyticsView.as_view(), name='entry-analytics-scoped'),
+    path('trends/', TrendsView.as_view(), name='trends'),
+    path('trends/<str:pk>/', TrendsView.as_view(), name='trends-scoped'),
+    path('entries/sync/', EntrySyncView.as_view(), name='entry-sync'),
+    path('entries/sync/<str:pk>/', EntrySyncView.as_view(), name='entry-sync-scoped'),
     path('entries/<int:pk>/', EntryDetailView.as_view()),
     path('filters/', FilterConfigurationListCreateView.as_view()),
     path('filters/<int:pk>/', FilterConfigurationDetailView.as_view()),
+    path('filters/<int:pk>/comparison/', FilterComparisonView.as_view(), name='filter-comparison'),
     path('create-configuration/', CreateConfiguration.as_view(), name = 'create-configuration'),
     path('remove-group-from-configuration/', RemoveGroupFromConfiguration.as_view()),
     path('add-group-to-configuration/', AddGroupToConfiguration.as_view()),
     path('download-survey-csv/', DownloadSurveyCSVView.as_view()),
+    path('export-jobs/<int:pk>/', ExportJobDetailView.as_view(), name='export-job'),
     path('generate-quarterly-xlsx/', GenerateQuarterlyXLSX.as_view()),
     path('filter-entries-by-date/', FilterEntriesByDateView.as_view()),
     path('delete-filter/<int:pk>/', DeleteFilterView.as_view()),
+
+    ## Async read endpoints for ASGI deployments
+    path('async/entries/', AsyncEntryListView.as_view(), name='async-entries'),
+    path('async/entries/summary/', AsyncEntrySummaryView.as_view(), name='async-entry-summary'),
+    path('async/entries/summary/<str:pk>/', AsyncEntrySummaryView.as_view(), name='async-entry-summary-scoped'),
+    path('async/filters/<int:pk>/', AsyncFilterDetailView.as_view(), name='async-filter-detail'),
 ]
\ No newline at end of file
@@ -1,51 +1,84 @@
-import csv
-from django.core.exceptions import PermissionDenied
-from django.db.models import Q
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.validators import validate_email
+from django.db.models import Q, Sum
 from django.utils.dateparse import parse_date
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
-from django.http import HttpResponse, JsonResponse
-from django.core.mail import EmailMessage
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views import View
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.authtoken.views import APIView
 
-import pandas as pd
-import os
-from openpyxl import load_workbook, Workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Font
 from openpyxl.utils import get_column_letter
 
-from datetime import datetime, timedelta
-import re
-from .serializers import EntrySerializer, FilterSerializer
-from .models import Entry, Filter
+from datetime import date, datetime, timedelta
+from . import rollup, sync
+from .analytics import (
+    PERIOD_MONTHS, TREND_BUCKETS, bucket_rows, build_robson_table, count_by_period, daily_arrays,
+    group_comparison_counts, robson_buckets, robson_report, robson_summary, robson_table,
+)
+from .export import exportable_entries, iter_csv_lines
+from .fast_serializers import (
+    day_representation, entry_values, queryset_groups, row_groups, serialize_entries, serialize_entry_rows,
+)
+from .jobs import enqueue_export
+from .ingest import InvalidSheetFormat, bulk_create_entries, parse_sheet, read_sheet
+from .serializers import EntrySerializer, ExportJobSerializer, FilterSerializer
+from .models import DailyEntryCount, Entry, ExportJob, Filter
+from .pagination import EntryCursorPagination
+from .renderers import (
+    ENTRY_RENDERER_CLASSES, ColumnarRenderer, bit_string, dictionary_encode, encode_groups,
+)
 from .permissions import CanReadEntry
-from users.models import Group, UserProfile
+from users.memberships import get_membership, get_memberships, member_group_ids, viewable_group_ids
+from users.models import Group
+from robson_insight.cache import CACHE_TIMEOUT, get_version, get_versions, make_key
 
-class EntryListView(generics.ListCreateAPIView):
+def wants_columnar(request):
+    return getattr(request.accepted_renderer, 'format', None) == ColumnarRenderer.format
+
+
+class FastEntryListMixin:
+    """
+    Lists entries with ``survey.fast_serializers`` instead of running
+    ``EntrySerializer`` per row. The JSON is the same, and the columnar
+    format is encoded from the same rows.
+    """
+    include_groups = True
+
+    def list(self, request, *args, **kwargs):
+        columnar = wants_columnar(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(entry_values(queryset))
+        if page is not None:
+            return self.get_paginated_response(serialize_entry_rows(page, self.include_groups, columnar))
+        return Response(serialize_entries(queryset, self.include_groups, columnar))
+
+
+class EntryListView(FastEntryListMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = EntrySerializer
+    pagination_class = EntryCursorPagination
+    renderer_classes = ENTRY_RENDERER_CLASSES
 
     def get_queryset(self):
-        user_profiles = UserProfile.objects.filter(
-            user=self.request.user
-        ).filter(Q(can_view=True) | Q(is_admin=True))
-        allowed_groups = user_profiles.values_list('group', flat=True)
+        allowed_groups = viewable_group_ids(self.request)
+        # Listed through the fast serializers, which read username and groups
+        # themselves; creating an entry doesn't use this queryset
         return Entry.objects.filter(groups__in=allowed_groups).distinct()
 
     def perform_create(self, serializer):
-        # Fetch all user profiles where the user has can_add permissions
-        user_profiles = UserProfile.objects.filter(
-            user=self.request.user
-        )
-        if not user_profiles.exists():
+        # Collect all groups the user belongs to
+        allowed_groups = member_group_ids(self.request)
+        if not allowed_groups:
             raise PermissionDenied("You do not have permission to add entries to any group.")
 
-        # Collect all groups the user can add to
-        allowed_groups = user_profiles.values_list('group', flat=True)
-
         # Save the entry and associate it with all allowed groups
         entry = serializer.save(user=self.request.user)
         entry.groups.set(allowed_groups)
@@ -59,139 +92,189 @@ class EntryListView(generics.ListCreateAPIView):
 
     def upload_file(self, file):
         try:
-            _, file_extension = os.path.splitext(file.name)
-            df = pd.DataFrame()
-            if file_extension == '.csv':
-                with open(file, 'r') as file:
-                    lines = file.readlines()
-
-                start_row = next(i for i, line in enumerate(lines) if line.strip().lower().startswith("group"))
-                df = pd.read_csv(file, skiprows=start_row, header=None)
-
-            elif file_extension == '.xlsx':
-                workbook = load_workbook(file, read_only=True)
-                sheet = workbook.active
-
-                start_row = next(i for i, row in enumerate(sheet.iter_rows(values_only=True))
-                                if str(row[0]).strip().lower().startswith("group"))
-                df = pd.read_excel(file, skiprows=start_row, header=None)
-            i = 1
-            count = 0
-
-            try:
-                if df.iat[0, i][:7] != "Quarter":
-                    raise Exception
-            except:
-                return Response({'error': 'Invalid format'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
-
-            while df.iat[0, i][:7] == "Quarter":
-                date = min(datetime.strptime(re.sub(r'(\d+)(st|nd|rd|th)', r'\1', df.iat[0, i].split("- ")[1]), '%d %B %Y'), datetime.now())
-                j = 2
-
-                try:
-                    if df.iat[j, 0][:5] != "Group":
-                        raise Exception
-                except:
-                    return Response({'error': 'Invalid format'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
-
-                while df.iat[j, 0][:5] == "Group":
-                    v = df.iat[j, i]
-                    if not pd.isna(v):
-                        for k in range(df.iat[j, i]):
-                            self._create_entry(df.iat[j, 0].split(' ')[1], 'n', date)
-                            count += 1
-                    c = df.iat[j, i + 1]
-                    if not pd.isna(c):
-                        for k in range(df.iat[j, i + 1]):
-                            df.iat[j, 0].split(' ')[1], 'y', date
-                            self._create_entry(df.iat[j, 0].split(' ')[1], 'y', date)
-                            count += 1
-                    j += 1
-                i += 2
-            return Response({"message": f"{count} entries uploaded successfully."}, status=status.HTTP_201_CREATED)
+            rows = list(parse_sheet(read_sheet(file)))
+        except InvalidSheetFormat:
+            return Response({'error': 'Invalid format'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def _create_entry(self, classification, csection, date):
+        group_ids = member_group_ids(self.request)
+        if not group_ids:
+            raise PermissionDenied("You do not have permission to add entries to any group.")
+
         try:
-            user = self.request.user
-            groups = UserProfile.objects.filter(user=user).values_list('group__name', flat=True).distinct()
-            entry_data = {
-                'classification': classification,
-                'csection': csection,
-                'date': date,
-                'group': groups,
-            }
-            serializer = self.get_serializer(data=entry_data)
-            serializer.is_valid(raise_exception=True)
-            self.perform_create(serializer)
+            count = bulk_create_entries(self.request.user, rows, group_ids)
+            return Response({"message": f"{count} entries uploaded successfully."}, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class FilterEntriesByDateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EntryCursorPagination
+    renderer_classes = ENTRY_RENDERER_CLASSES
 
     def post(self, request):
-        current_user = request.user
-
-        user_groups = UserProfile.objects.filter(user=current_user).values_list('group', flat=True)
+        user_groups = member_group_ids(request)
 
-        if not user_groups.exists():
-            return JsonResponse({'entries': []})
-
-        start_date = request.POST.get('start_date', None)
-        end_date = request.POST.get('end_date', None)
+        if not user_groups:
+            return Response({'entries': []})
 
         try:
-            start_date = parse_date(start_date) if start_date else None
-            end_date = parse_date(end_date) if end_date else None
+            start_date, end_date = parse_date_range(
+                request.POST.get('start_date', None),
+                request.POST.get('end_date', None),
+            )
         except ValueError:
-            return JsonResponse({'error': 'Invalid date format'}, status=400)
+            return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
 
+        entries = Entry.objects.filter(groups__in=user_groups).distinct()
         if start_date:
-            start_date = datetime.combine(start_date, datetime.min.time())
+            entries = entries.filter(date__gte=start_date)
         if end_date:
-            end_date = datetime.combine(end_date, datetime.max.time())
-        
-        if start_date and end_date:
-            entries = Entry.objects.filter(
-                date__range=(start_date, end_date),
-                groups__in=user_groups
-            ).distinct()
-        elif start_date:
-            entries = Entry.objects.filter(
-                date__gte=start_date,
-                groups__in=user_groups
-            ).distinct()
-        elif end_date:
-            entries = Entry.objects.filter(
-                date__lte=end_date,
-                groups__in=user_groups
-            ).distinct()
+            entries = entries.filter(date__lte=end_date)
+        entries = entries.order_by('date', 'id')
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(entry_values(entries), request, view=self)
+        if page is not None:
+            rows, groups = page, row_groups(page)
         else:
-            entries = Entry.objects.filter(groups__in=user_groups).distinct()
-            
-        entries = entries.order_by('date')
+            rows, groups = list(entry_values(entries)), queryset_groups(entries)
 
-        entries_data = [
+        build = self.build_columns if wants_columnar(request) else self.build_rows
+        entries_data = build(rows, groups)
+        if page is not None:
+            return Response(paginator.get_paginated_data(entries_data, results_key='entries'))
+        return Response({'entries': entries_data})
+
+    def build_rows(self, rows, groups):
+        return [
             {
-                'id': entry.pk,
-                'classification': entry.classification,
-                'user': entry.user.username if entry.user else None,
-                'groups': [group.name for group in entry.groups.all()],
-                'csection': entry.csection,
-                'date': entry.date.isoformat(),
+                'id': row['id'],
+                'classification': row['classification'],
+                'user': row['username'],
+                'groups': [group['name'] for group in groups.get(row['id'], [])],
+                'csection': row['csection'],
+                'count': row['count'],
+                'date': row['date'].isoformat(),
             }
-            for entry in entries
+            for row in rows
         ]
 
-        return JsonResponse({'entries': entries_data})
+    def build_columns(self, rows, groups):
+        represent_day = day_representation()
+        return {
+            'count': len(rows),
+            'columns': {
+                'id': [row['id'] for row in rows],
+                'classification': dictionary_encode([row['classification'] for row in rows]),
+                'user': dictionary_encode([row['username'] for row in rows]),
+                'groups': encode_groups(
+                    [[group['name'] for group in groups.get(row['id'], [])] for row in rows], key=None,
+                ),
+                'csection': bit_string(row['csection'] for row in rows),
+                'count': [row['count'] for row in rows],
+                'date': [represent_day(row['date']) for row in rows],
+            },
+        }
+
+
+class EntryScopeMixin:
+    """
+    Resolves the ``filter-<id>``/``group-<id>`` keys used by the entry views to
+    the groups the requesting user is allowed to view.
+    """
+
+    def get_allowed_groups(self):
+        return viewable_group_ids(self.request)
+
+    def get_scoped_groups(self, pk=None):
+        if pk is None:
+            return self.get_allowed_groups()
+
+        # Determine if the pk is prefixed with 'filter-' or 'group-'
+        if pk.startswith('filter-'):
+            filter_id = pk.split('-')[1]
+            return self.get_groups_by_filter(filter_id)
+        elif pk.startswith('group-'):
+            group_id = pk.split('-')[1]
+            return self.get_groups_by_group(group_id)
+        else:
+            return []
+
+    def get_groups_by_filter(self, filter_id):
+        try:
+            filter_id = int(filter_id)
+        except ValueError:
+            return []
+        key = filter_groups_key(filter_id, get_version('filter', filter_id))
+        cached = cache.get(key)
+        if cached is None:
+            links = Filter.groups.through.objects.filter(filter_id=filter_id)
+            cached = (
+                Filter.objects.filter(pk=filter_id).values_list('user_id', flat=True).first(),
+                list(links.values_list('group_id', flat=True)),
+            )
+            cache.set(key, cached, CACHE_TIMEOUT)
+
+        owner_id, group_ids = cached
+        if owner_id != self.request.user.pk:
+            return []
+        allowed_groups = set(self.get_allowed_groups())
+        return [group_id for group_id in group_ids if group_id in allowed_groups]
+
+    def get_groups_by_group(self, group_id):
+        membership = get_membership(self.request, group_id)
+        if membership is None or not (membership.can_view or membership.is_admin):
+            raise PermissionDenied("You do not have permission to view entries for this group.")
+        return [int(group_id)]
+
+    def get_date_range(self):
+        start_date = self.request.query_params.get('start_date')
+        end_date = self.request.query_params.get('end_date')
+        return parse_date_range(start_date, end_date)
+
+    def filter_by_date(self, queryset, start_date, end_date):
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+        return queryset
+
+
+def filter_groups_key(filter_id, version):
+    """Cache key for a filter's ``(owner id, group ids)``."""
+    return f'filter-groups:{filter_id}:{version}'
+
+
+def entry_summary_key(groups, versions, start_date, end_date):
+    return make_key('entry-summary', [(group, versions[group]) for group in groups], start_date, end_date)
+
+
+def parse_date_range(start_date, end_date):
+    """
+    Parse ``YYYY-MM-DD`` bounds into datetimes covering whole days.
+    Raises ValueError if either bound is malformed.
+    """
+    start = parse_date(start_date) if start_date else None
+    end = parse_date(end_date) if end_date else None
+    if (start_date and start is None) or (end_date and end is None):
+        raise ValueError('Invalid date format')
 
+    if start:
+        start = datetime.combine(start, datetime.min.time())
+    if end:
+        end = datetime.combine(end, datetime.max.time())
+    return start, end
 
-class EntryFilterListView(generics.ListAPIView):
+
+class EntryFilterListView(FastEntryListMixin, EntryScopeMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = EntrySerializer
+    pagination_class = EntryCursorPagination
+    renderer_classes = ENTRY_RENDERER_CLASSES
+    include_groups = False
 
     def get_serializer(self, *args, **kwargs):
         # Exclude 'groups' field from the serializer
@@ -199,45 +282,187 @@ class EntryFilterListView(generics.ListAPIView):
         return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
-        pk = self.kwargs.get('pk')
+        groups = self.get_scoped_groups(self.kwargs.get('pk'))
+        return Entry.objects.filter(groups__in=groups).distinct()
 
-        # Determine if the pk is prefixed with 'filter-' or 'group-'
-        if pk.startswith('filter-'):
-            filter_id = pk.split('-')[1]
-            return self.get_entries_by_filter(filter_id)
-        elif pk.startswith('group-'):
-            group_id = pk.split('-')[1]
-            return self.get_entries_by_group(group_id)
-        else:
-            return Entry.objects.none()
 
-    def get_entries_by_filter(self, filter_id):
+class EntrySummaryView(EntryScopeMixin, APIView):
+    """
+    Robson table for the entries visible to the user, computed in the database
+    instead of shipping every entry to the client.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk=None):
         try:
-            user_filter = Filter.objects.get(pk=filter_id, user=self.request.user)
-            user_profiles = UserProfile.objects.filter(
-                user=self.request.user
-            ).filter(Q(can_view=True) | Q(is_admin=True))
-            allowed_groups = user_profiles.values_list('group', flat=True)
+            start_date, end_date = self.get_date_range()
+        except ValueError:
+            return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        groups = sorted(self.get_scoped_groups(pk))
+        # Keyed on the groups' versions, which change whenever an entry in
+        # them is added, edited or removed (see survey.signals).
+        versions = get_versions('group', groups)
+        key = entry_summary_key(groups, versions, start_date, end_date)
+        summary = cache.get(key)
+        if summary is None:
+            summary = self.get_summary(groups, start_date, end_date)
+            cache.set(key, summary, CACHE_TIMEOUT)
+        return Response(summary, status=status.HTTP_200_OK)
+
+    def get_summary(self, groups, start_date, end_date):
+        if len(groups) == 1:
+            # A single group can be answered from the daily rollup. Entries may
+            # belong to several groups, so wider scopes count distinct entries.
+            return build_robson_table(rollup.counts_for_group(groups[0], start_date, end_date))
+
+        entries = self.filter_by_date(Entry.objects.filter(groups__in=groups), start_date, end_date)
+        return robson_summary(entries)
+
+class EntryAnalyticsView(EntryScopeMixin, APIView):
+    """
+    The Robson table and its trend per month, quarter or year, computed with
+    NumPy from the births per day so the client doesn't aggregate entries.
+    """
+    permission_classes = [permissions.IsAuthenticated]
 
-            groups_in_filter = user_filter.groups.filter(id__in=allowed_groups)
-            return Entry.objects.filter(groups__in=groups_in_filter).distinct()
+    def get(self, request, pk=None):
+        try:
+            start_date, end_date = self.get_date_range()
+        except ValueError:
+            return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        period = request.query_params.get('period', 'quarter')
+        if period not in PERIOD_MONTHS:
+            return Response(
+                {'error': f"period must be one of: {', '.join(PERIOD_MONTHS)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        groups = sorted(self.get_scoped_groups(pk))
+        versions = get_versions('group', groups)
+        key = make_key('entry-analytics', [(group, versions[group]) for group in groups], start_date, end_date, period)
+        report = cache.get(key)
+        if report is None:
+            codes, csection, days, weights = daily_arrays(groups, start_date, end_date)
+            report = robson_report(
+                codes, csection, days, weights, period,
+                first=start_date.date() if start_date else None,
+                last=end_date.date() if end_date else None,
+            )
+            cache.set(key, report, CACHE_TIMEOUT)
+        return Response(report, status=status.HTTP_200_OK)
 
-        except Filter.DoesNotExist:
-            return Entry.objects.none()
 
-    def get_entries_by_group(self, group_id):
+class TrendsView(EntryScopeMixin, APIView):
+    """
+    CS-rate trends per week, month, July-start quarter, year or fiscal year,
+    bucketed by the database so only one row per bucket and cell is read.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk=None):
         try:
-            user_profiles = UserProfile.objects.filter(
-                user=self.request.user
-            ).filter(Q(can_view=True) | Q(is_admin=True), group__id=group_id)
+            start_date, end_date = self.get_date_range()
+        except ValueError:
+            return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        bucket = request.query_params.get('bucket', 'month')
+        if bucket not in TREND_BUCKETS:
+            return Response(
+                {'error': f"bucket must be one of: {', '.join(TREND_BUCKETS)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        groups = sorted(self.get_scoped_groups(pk))
+        versions = get_versions('group', groups)
+        key = make_key('entry-trends', [(group, versions[group]) for group in groups], start_date, end_date, bucket)
+        trends = cache.get(key)
+        if trends is None:
+            trends = robson_buckets(bucket_rows(groups, bucket, start_date, end_date), bucket)
+            cache.set(key, trends, CACHE_TIMEOUT)
+        return Response(trends, status=status.HTTP_200_OK)
+
+
+class FilterComparisonView(EntryScopeMixin, APIView):
+    """
+    The Robson table of every group in a filter, side by side, from one
+    conditional-aggregation query over the daily rollup.
+    """
+    permission_classes = [permissions.IsAuthenticated]
 
-            if not user_profiles.exists():
-                raise PermissionDenied("You do not have permission to view entries for this group.")
+    def get(self, request, pk):
+        try:
+            start_date, end_date = self.get_date_range()
+        except ValueError:
+            return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Entry.objects.filter(groups__id=group_id).distinct()
+        filter_instance = Filter.objects.filter(pk=pk, user=request.user).values('id', 'name').first()
+        if filter_instance is None:
+            return Response({'error': 'Filter not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        groups = sorted(self.get_groups_by_filter(pk))
+        versions = get_versions('group', groups)
+        key = make_key(
+            'filter-comparison', pk, get_version('filter', pk),
+            [(group, versions[group]) for group in groups], start_date, end_date,
+        )
+        comparison = cache.get(key)
+        if comparison is None:
+            comparison = self.get_comparison(filter_instance, groups, start_date, end_date)
+            cache.set(key, comparison, CACHE_TIMEOUT)
+        return Response(comparison, status=status.HTTP_200_OK)
+
+    def get_comparison(self, filter_instance, groups, start_date, end_date):
+        births, csections = group_comparison_counts(groups, start_date, end_date)
+        names = dict(Group.objects.filter(pk__in=groups).values_list('id', 'name'))
+        return {
+            'filter': filter_instance,
+            'groups': [
+                {'id': group, 'name': names.get(group), **robson_table(births[index], csections[index])}
+                for index, group in enumerate(groups)
+            ],
+        }
+
+
+class EntrySyncView(EntryScopeMixin, APIView):
+    """
+    Incremental entry sync. Clients send back the ``token`` from their last
+    response and receive only the entries changed since then plus the ids of
+    deleted ones. Without a token, when the scope's groups have changed, or
+    when the token predates pruned tombstones, the full list is returned with
+    ``reset`` set. Follow ``has_more`` with the new token until it is false.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = ENTRY_RENDERER_CLASSES
+
+    def get(self, request, pk=None):
+        groups = sorted(self.get_scoped_groups(pk))
+        fingerprint = sync.scope_fingerprint(groups)
+
+        since = floor = None
+        token = request.query_params.get('token')
+        if token:
+            try:
+                since, token_fingerprint, floor = sync.decode_token(token)
+            except sync.InvalidSyncToken as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if token_fingerprint != fingerprint:
+                since = floor = None
+
+        try:
+            page_size = int(request.query_params.get('page_size', sync.SYNC_PAGE_SIZE))
+        except ValueError:
+            page_size = sync.SYNC_PAGE_SIZE
+        page_size = min(max(page_size, 1), sync.MAX_SYNC_PAGE_SIZE)
+
+        page = sync.changes_since(groups, since, page_size, floor)
+        return Response({
+            'token': sync.encode_token(page.seq, fingerprint, page.floor),
+            'reset': page.reset,
+            'has_more': page.has_more,
+            'entries': EntrySerializer(page.entries, many=True, exclude_groups=True).data,
+            'deleted': page.deleted,
+        }, status=status.HTTP_200_OK)
 
-        except Group.DoesNotExist:
-            return Entry.objects.none()
 
 class DownloadSurveyCSVView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -245,46 +470,36 @@ class DownloadSurveyCSVView(generics.ListCreateAPIView):
 
     def get(self, request):
         try:
-            queryset = Entry.objects.filter(
-                user__in=UserProfile.objects.filter(
-                    group__in=UserProfile.objects.filter(
-                        user=request.user, can_view=True
-                    ).values_list('group', flat=True)
-                ).values_list('user', flat=True).distinct()
-            )
-            model = queryset.model
-            model_fields = model._meta.fields + model._meta.many_to_many
-            field_names = [field.name for field in model_fields]
-
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="survey_data.csv"'
-            writer = csv.writer(response, delimiter=",")
-            writer.writerow(field_names)
-
-            for row in queryset:
-                values = [getattr(row, field) for field in field_names if field != "groups"]
-                group_names = ', '.join(row.groups.values_list('name', flat=True))
-                values.append(group_names)
-                writer.writerow(values)
+            queryset = exportable_entries(request.user)
 
             recipient_email = request.GET.get('email')
             if recipient_email:
-                email = EmailMessage(
-                    subject='Survey Data CSV',
-                    body='Please see the attached survey data.',
-                    to=[recipient_email]
+                try:
+                    validate_email(recipient_email)
+                except ValidationError:
+                    return Response({'error': 'Invalid email address'}, status=status.HTTP_400_BAD_REQUEST)
+                job = enqueue_export(request.user, recipient_email)
+                return Response(
+                    {'message': 'CSV export queued.', 'job_id': job.pk},
+                    status=status.HTTP_202_ACCEPTED
                 )
-                email.attach('survey_data.csv', response.getvalue(), 'text/csv')
-                email.send()
-
-                return Response({'message': 'CSV sent to email successfully!'}, status=status.HTTP_200_OK)
 
+            response = StreamingHttpResponse(iter_csv_lines(queryset), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="survey_data.csv"'
             return response
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class ExportJobDetailView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ExportJobSerializer
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user)
+
+
 class EntryDetailView(generics.RetrieveAPIView):
     permission_classes = [CanReadEntry]
     serializer_class = EntrySerializer
@@ -303,8 +518,9 @@ class FilterConfigurationListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         user_filters = Filter.objects.filter(user=self.request.user)
         # Get groups the user has permission to view
-        user_profiles = UserProfile.objects.filter(user=self.request.user, can_view=True)
-        allowed_groups = user_profiles.values_list('group', flat=True)
+        allowed_groups = [
+            group_id for group_id, membership in get_memberships(self.request).items() if membership.can_view
+        ]
 
         # Include filters with no groups or with allowed groups
         return user_filters.filter(Q(groups__in=allowed_groups) | Q(groups__isnull=True)).distinct()
@@ -312,12 +528,11 @@ class FilterConfigurationListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         groups = serializer.validated_data.get('groups', [])
 
-        user_groups = Group.objects.filter(userprofile__user=self.request.user)
-
-        user_profiles = UserProfile.objects.filter(user=self.request.user, can_view=True)
-        allowed_groups = user_profiles.values_list('group', flat=True)
+        allowed_groups = [
+            group_id for group_id, membership in get_memberships(self.request).items() if membership.can_view
+        ]
 
-        if not all(group in allowed_groups for group in groups):
+        if not all(group.pk in allowed_groups for group in groups):
             raise PermissionDenied("You can only add groups you belong to.")
 
         serializer.save(user=self.request.user)
@@ -405,10 +620,16 @@ class FilterConfigurationDetailView(generics.ListAPIView):
 
         return Response(group_ids)
 
-class GenerateQuarterlyXLSX(APIView):
+class GenerateQuarterlyXLSX(EntryScopeMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_quarters(self):
+    group_labels = [
+        "Group 1", "Group 2", "Group 3", "Group 4", "Group 5.1",
+        "Group 5.2", "Group 6", "Group 7", "Group 8", "Group 9", "Group 10"
+    ]
+
+    def get_fiscal_year(self):
+        # Default to the last complete July-June fiscal year
         today = datetime.today()
         current_year_start = datetime(today.year, 7, 1)
         last_year_start = current_year_start - timedelta(days=365)
@@ -417,22 +638,123 @@ class GenerateQuarterlyXLSX(APIView):
             start_date = last_year_start
         else:
             start_date = last_year_start - timedelta(days=365)
+        return start_date.year
+
+    def get_quarters(self, fiscal_year=None):
+        year = fiscal_year if fiscal_year is not None else self.get_fiscal_year()
 
         quarters = [
-            f"Quarter 1: 1st July {start_date.year} - 30th September {start_date.year}",
-            f"Quarter 2: 1st October {start_date.year} - 31st December {start_date.year}",
-            f"Quarter 3: 1st January {start_date.year + 1} - 31st March {start_date.year + 1}",
-            f"Quarter 4: 1st April {start_date.year + 1} - 30th June {start_date.year + 1}",
+            f"Quarter 1: 1st July {year} - 30th September {year}",
+            f"Quarter 2: 1st October {year} - 31st December {year}",
+            f"Quarter 3: 1st January {year + 1} - 31st March {year + 1}",
+            f"Quarter 4: 1st April {year + 1} - 30th June {year + 1}",
         ]
         return quarters
 
-    def get(self, request):
-        quarters = self.get_quarters()
+    def get_quarter_ranges(self, fiscal_year):
+        return [
+            (date(fiscal_year, 7, 1), date(fiscal_year, 9, 30)),
+            (date(fiscal_year, 10, 1), date(fiscal_year, 12, 31)),
+            (date(fiscal_year + 1, 1, 1), date(fiscal_year + 1, 3, 31)),
+            (date(fiscal_year + 1, 4, 1), date(fiscal_year + 1, 6, 30)),
+        ]
+
+    def get_quarter_counts(self, fiscal_year, scope):
+        """``{(quarter, classification, csection): count}`` from one aggregated query."""
+        quarters = self.get_quarter_ranges(fiscal_year)
+        groups = list(self.get_scoped_groups(scope))
+
+        if len(groups) == 1:
+            return count_by_period(
+                DailyEntryCount.objects.filter(group_id=groups[0]), quarters, total=Sum('count')
+            )
 
-        group_labels = [
-            "Group 1", "Group 2", "Group 3", "Group 4", "Group 5.1",
-            "Group 5.2", "Group 6", "Group 7", "Group 8", "Group 9", "Group 10"
+        day_ranges = [
+            (
+                timezone.make_aware(datetime.combine(start, datetime.min.time())),
+                timezone.make_aware(datetime.combine(end, datetime.max.time())),
+            )
+            for start, end in quarters
         ]
+        return count_by_period(Entry.objects.filter(groups__in=groups), day_ranges)
+
+    def get_populated(self, request):
+        try:
+            fiscal_year = int(request.query_params.get('fiscal_year', self.get_fiscal_year()))
+        except ValueError:
+            return Response({'error': 'Invalid fiscal year'}, status=status.HTTP_400_BAD_REQUEST)
+        # The year ends in June of fiscal_year + 1, which must still be a valid date
+        if not date.min.year <= fiscal_year < date.max.year:
+            return Response({'error': 'Invalid fiscal year'}, status=status.HTTP_400_BAD_REQUEST)
+
+        quarters = self.get_quarters(fiscal_year)
+        counts = self.get_quarter_counts(fiscal_year, request.query_params.get('scope'))
+
+        # Every value is known up front, so Final and Total are computed here
+        # instead of with SUMPRODUCT formulas, and the sheet can be streamed.
+        rows = []
+        for label in self.group_labels + ["No Record"]:
+            classification = label.split(' ')[1] if label.startswith("Group") else None
+            row = []
+            for quarter in range(len(quarters)):
+                row.append(counts.get((quarter, classification, False), 0))
+                row.append(counts.get((quarter, classification, True), 0))
+            row.extend([sum(row[0::2]), sum(row[1::2])])
+            rows.append([label] + row)
+        total_row = ["Total"] + [sum(column) for column in zip(*(row[1:] for row in rows))]
+
+        headers = ["Group Robson"]
+        for quarter in quarters:
+            headers.extend([quarter, None])
+        headers.extend(["Final", None])
+        subheaders = [None] + ["Vaginal Delivery", "C/Section"] * (len(quarters) + 1)
+
+        # Widths match the old auto-size pass: longest value in the column + 2.
+        # Quarter and Final headers are merged over their two columns.
+        widths = [max(len("Group Robson"), len("No Record")) + 2]
+        for column in range(1, len(headers)):
+            values = [len(subheaders[column]), len(str(total_row[column]))]
+            if column % 2:
+                values.append(len(headers[column]))
+            widths.append(max(values) + 2)
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Quarterly Data")
+        for column, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(column)].width = width
+
+        bold = Font(bold=True)
+        centered = Alignment(horizontal="center", vertical="center")
+
+        def styled(value, font=None, alignment=None):
+            cell = WriteOnlyCell(ws, value=value)
+            if font:
+                cell.font = font
+            if alignment:
+                cell.alignment = alignment
+            return cell
+
+        ws.append([styled(value, bold, centered) for value in headers])
+        ws.append([styled(value, alignment=centered) for value in subheaders])
+        for row in rows:
+            ws.append(row)
+        ws.append([styled(value, bold) for value in total_row])
+
+        ws.merged_cells.add("A1:A2")
+        for column in range(2, len(headers) + 1, 2):
+            ws.merged_cells.add(f"{get_column_letter(column)}1:{get_column_letter(column + 1)}1")
+
+        response = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        response["Content-Disposition"] = f'attachment; filename="quarterly_survey_data_{fiscal_year}.xlsx"'
+        wb.save(response)
+        return response
+
+    def get(self, request):
+        if request.query_params.get('populate', '').lower() in ('1', 'true'):
+            return self.get_populated(request)
+
+        quarters = self.get_quarters()
+        group_labels = self.group_labels
 
         # Create workbook and sheet
         wb = Workbook()
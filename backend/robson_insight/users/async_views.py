@@ -0,0 +1,17 @@
+"""Async variants of the read-heavy users endpoints, mounted under ``users/async/``."""
+from django.http import JsonResponse
+
+from robson_insight.async_views import AsyncTokenView
+from .memberships import aget_memberships
+from .models import Group
+
+
+class AsyncUserGroupsCanView(AsyncTokenView):
+    """Async ``UserGroupsCanView``."""
+
+    async def get(self, request):
+        group_ids = [
+            group_id for group_id, membership in (await aget_memberships(request)).items() if membership.can_view
+        ]
+        groups = Group.objects.filter(pk__in=group_ids).values('id', 'name')
+        return JsonResponse([group async for group in groups], safe=False)
@@ -0,0 +1,193 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.signing import Signer
+from django.db.models.functions import Lower
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Invite, UserProfile
+
+
+logger = logging.getLogger(__name__)
+
+INVITE_SUBJECT = 'Robson Insights Invitation'
+INVITE_URL = 'http://localhost:8081/signup?token={token}'
+
+# Each worker holds one SMTP connection; keep this below the provider's limit
+# on concurrent sessions.
+MAX_WORKERS = 4
+BATCH_SIZE = 50
+SWEEP_BATCH_SIZE = 1000
+
+_URL_PLACEHOLDER = '__robson_invite_url__'
+
+
+def invite_url(token):
+    return INVITE_URL.format(token=token)
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def invite_signer(group_id):
+    # Salting with the group keeps tokens unique when the same address is
+    # invited to several groups.
+    return Signer(salt=f'users.invite.{group_id}')
+
+
+def invite_token(email, group_id, signer=None):
+    return (signer or invite_signer(group_id)).signature(email)
+
+
+def create_invites(group, emails):
+    """
+    Create invites for every address that isn't already a member of ``group``
+    or holding a pending invite to it.
+
+    Existing users, memberships and invites are each looked up with one query
+    and the new invites are saved with a single ``bulk_create``. Expired
+    invites for the same addresses are replaced.
+
+    Returns ``(invites, skipped)`` where ``invites`` maps email to the new
+    Invite and ``skipped`` maps email to the reason it was left out.
+    """
+    emails = list(dict.fromkeys(normalize_email(email) for email in emails))
+    skipped = {}
+
+    users = dict(
+        User.objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=emails).values_list('email_lower', 'pk')
+    )
+    members = set(
+        UserProfile.objects.filter(group=group, user_id__in=users.values()).values_list('user_id', flat=True)
+    )
+    for email, user_id in users.items():
+        if user_id in members:
+            skipped[email] = 'already a member'
+
+    expired = []
+    cutoff = timezone.now() - Invite.EXPIRY
+    existing = Invite.objects.filter(group=group, email__in=emails).values_list('pk', 'email', 'created_on')
+    for pk, email, created_on in existing:
+        if created_on < cutoff:
+            expired.append(pk)
+        else:
+            skipped.setdefault(email, 'already invited')
+    if expired:
+        Invite.objects.filter(pk__in=expired).delete()
+
+    signer = invite_signer(group.pk)
+    invites = Invite.objects.bulk_create([
+        Invite(token=invite_token(email, group.pk, signer), group=group, email=email)
+        for email in emails if email not in skipped
+    ])
+    return {invite.email: invite for invite in invites}, skipped
+
+
+def render_invite_template():
+    """
+    Render ``email_invite.html`` once with a placeholder so each recipient only
+    costs a string substitution.
+    """
+    return render_to_string('email_invite.html', {'invite_url': _URL_PLACEHOLDER})
+
+
+def build_invite_message(email, token, html_template=None):
+    if html_template is None:
+        html_template = render_invite_template()
+    url = invite_url(token)
+    message = EmailMultiAlternatives(
+        subject=INVITE_SUBJECT,
+        body=url,  # Fallback text for email clients that don't support HTML
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+    message.attach_alternative(html_template.replace(_URL_PLACEHOLDER, url), "text/html")
+    return message
+
+
+def _reopen(connection):
+    connection.close()
+    try:
+        connection.open()
+    except Exception:
+        # send_messages opens its own connection when none is held
+        pass
+
+
+def _send_batch(messages):
+    """
+    Send a batch over one connection, one message at a time so a rejected
+    address doesn't take the rest of the batch down with it.
+    """
+    results = {}
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        return {message.to[0]: str(e) or e.__class__.__name__ for message in messages}
+    try:
+        for message in messages:
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                results[message.to[0]] = str(e) or e.__class__.__name__
+                # The session may be unusable after an error; start a new one
+                _reopen(connection)
+            else:
+                results[message.to[0]] = None
+    finally:
+        connection.close()
+    return results
+
+
+def send_invites(tokens_by_email, max_workers=MAX_WORKERS, batch_size=BATCH_SIZE):
+    """
+    Email an invitation to each ``{email: token}``. Batches are spread over a
+    small thread pool, each reusing a single SMTP connection.
+
+    Returns ``{email: None}`` for delivered invitations and ``{email: error}``
+    for the ones that failed.
+    """
+    started = time.perf_counter()
+    html_template = render_invite_template()
+    messages = [
+        build_invite_message(email, token, html_template)
+        for email, token in tokens_by_email.items()
+    ]
+    batches = [messages[start:start + batch_size] for start in range(0, len(messages), batch_size)]
+
+    results = {}
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            for batch_results in executor.map(_send_batch, batches):
+                results.update(batch_results)
+
+    failed = sum(1 for error in results.values() if error)
+    logger.info(
+        "Sent %d invitations (%d failed) in %.3fs",
+        len(results) - failed, failed, time.perf_counter() - started,
+    )
+    return results
+
+
+def sweep_expired_invites(batch_size=SWEEP_BATCH_SIZE):
+    """
+    Delete expired invites in batches of primary keys so each DELETE stays
+    short. Returns how many invites were removed.
+    """
+    removed = 0
+    while True:
+        batch = list(Invite.objects.expired().order_by('created_on').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        removed += Invite.objects.filter(pk__in=batch).delete()[0]
+    if removed:
+        logger.info("Removed %d expired invites", removed)
+    return removed
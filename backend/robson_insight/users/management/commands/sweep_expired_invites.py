@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.invites import SWEEP_BATCH_SIZE, sweep_expired_invites
+
+
+class Command(BaseCommand):
+    help = "Deletes invites older than Invite.EXPIRY in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Sweep once and exit.")
+        parser.add_argument('--interval', type=float, default=3600, help="Seconds to sleep between sweeps.")
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE, help="Invites deleted per statement.")
+
+    def handle(self, *args, **options):
+        while True:
+            removed = sweep_expired_invites(batch_size=options['batch_size'])
+            self.stdout.write(f"Removed {removed} expired invite(s).")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,114 @@
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from robson_insight.cache import CACHE_TIMEOUT, aget_version, bump_version, get_version
+from .models import UserProfile
+
+
+Membership = namedtuple('Membership', ['is_admin', 'can_view', 'can_add'])
+
+_CACHE_ATTR = '_group_memberships'
+
+
+def _base_request(request):
+    # DRF wraps the Django request; cache on the underlying one so permission
+    # classes, views and plain Django code all see the same map.
+    return getattr(request, '_request', request)
+
+
+def get_memberships(request):
+    """
+    ``{group_id: Membership}`` for the requesting user, loaded with a single
+    query the first time it is needed in a request.
+    """
+    base = _base_request(request)
+    memberships = getattr(base, _CACHE_ATTR, None)
+    if memberships is None:
+        memberships = {}
+        if request.user.is_authenticated:
+            memberships = load_memberships(request.user.pk)
+        setattr(base, _CACHE_ATTR, memberships)
+    return memberships
+
+
+def _membership_rows(user_id):
+    return UserProfile.objects.filter(user_id=user_id).values_list(
+        'group_id', 'is_admin', 'can_view', 'can_add'
+    )
+
+
+def load_memberships(user_id):
+    """
+    Read a user's memberships through the shared cache. The key carries the
+    user's version, which ``users.signals`` bumps on every UserProfile change.
+    """
+    key = f'memberships:{user_id}:{get_version("user", user_id)}'
+    memberships = cache.get(key)
+    if memberships is None:
+        rows = _membership_rows(user_id)
+        memberships = {group_id: Membership(*flags) for group_id, *flags in rows}
+        cache.set(key, memberships, CACHE_TIMEOUT)
+    return memberships
+
+
+async def aget_memberships(request):
+    """Async counterpart of ``get_memberships`` for async views."""
+    base = _base_request(request)
+    memberships = getattr(base, _CACHE_ATTR, None)
+    if memberships is None:
+        memberships = {}
+        if request.user.is_authenticated:
+            memberships = await aload_memberships(request.user.pk)
+        setattr(base, _CACHE_ATTR, memberships)
+    return memberships
+
+
+async def aload_memberships(user_id):
+    key = f'memberships:{user_id}:{await aget_version("user", user_id)}'
+    memberships = await cache.aget(key)
+    if memberships is None:
+        rows = _membership_rows(user_id)
+        memberships = {group_id: Membership(*flags) async for group_id, *flags in rows}
+        await cache.aset(key, memberships, CACHE_TIMEOUT)
+    return memberships
+
+
+def invalidate_memberships(request):
+    base = _base_request(request)
+    if hasattr(base, _CACHE_ATTR):
+        delattr(base, _CACHE_ATTR)
+    if request.user.is_authenticated:
+        bump_version('user', request.user.pk)
+
+
+def get_membership(request, group_id):
+    try:
+        return get_memberships(request).get(int(group_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def member_group_ids(request):
+    return list(get_memberships(request))
+
+
+def _viewable(memberships):
+    return [
+        group_id for group_id, membership in memberships.items()
+        if membership.can_view or membership.is_admin
+    ]
+
+
+def viewable_group_ids(request):
+    """Groups whose entries the user may read: ``can_view`` or admin."""
+    return _viewable(get_memberships(request))
+
+
+async def aviewable_group_ids(request):
+    return _viewable(await aget_memberships(request))
+
+
+def is_group_admin(request, group_id):
+    membership = get_membership(request, group_id)
+    return membership is not None and membership.is_admin
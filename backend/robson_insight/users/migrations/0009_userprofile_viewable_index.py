@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_merge_20240929_2048'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('can_view', True), ('is_admin', True), _connector='OR'), fields=['user', 'group'], name='users_profile_viewable_idx'),
+        ),
+    ]
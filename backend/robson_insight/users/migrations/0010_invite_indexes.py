@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_userprofile_viewable_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invite',
+            index=models.Index(fields=['created_on'], name='users_invite_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invite',
+            index=models.Index(fields=['email', 'created_on'], name='users_invite_email_created_idx'),
+        ),
+    ]
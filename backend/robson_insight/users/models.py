@@ -31,6 +31,14 @@ class UserProfile(models.Model):
 
     class Meta:
         unique_together = ('user', 'group')
+        indexes = [
+            # Most views look up the groups a user can view
+            models.Index(
+                fields=['user', 'group'],
+                condition=models.Q(can_view=True) | models.Q(is_admin=True),
+                name='users_profile_viewable_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.group.name}{" (Admin)" if self.is_admin else ""}'
@@ -48,6 +56,15 @@ class UserProfile(models.Model):
         super(UserProfile, self).save(*args, **kwargs)
         
         
+class InviteQuerySet(models.QuerySet):
+
+    def expired(self):
+        return self.filter(created_on__lt=timezone.now() - Invite.EXPIRY)
+
+    def pending(self):
+        return self.filter(created_on__gte=timezone.now() - Invite.EXPIRY)
+
+
 class Invite(models.Model):
     token = models.CharField(
         max_length=100,
@@ -62,9 +79,20 @@ class Invite(models.Model):
         auto_now_add=True
     )
     
+    EXPIRY = timedelta(hours=24)
+
+    objects = InviteQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The sweeper deletes by age; invite lists filter by address and age
+            models.Index(fields=['created_on'], name='users_invite_created_idx'),
+            models.Index(fields=['email', 'created_on'], name='users_invite_email_created_idx'),
+        ]
+
     def is_expired(self):
         now = timezone.now()
-        expiry_time = self.created_on + timedelta(hours=24)
+        expiry_time = self.created_on + self.EXPIRY
         return now > expiry_time
 
     def __str__(self):
@@ -1,6 +1,7 @@
 from django.core.signing import Signer
 from rest_framework import serializers
 
+from .invites import normalize_email
 from .models import UserProfile, Group, Invite
 
 
@@ -48,6 +49,5 @@ class MassInviteSerializer(serializers.Serializer):
     )
     
     def validate_emails(self, emails):
-        if len(emails) != len(set(emails)):
-            raise serializers.ValidationError("Duplicate emails are not allowed.")
-        return emails
+        # Addresses differing only in case or surrounding space are one invite
+        return list(dict.fromkeys(normalize_email(email) for email in emails))
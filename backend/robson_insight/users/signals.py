@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from robson_insight.cache import bump_version
+from .models import Group, UserProfile
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def bump_user_version_on_membership_changed(sender, instance, **kwargs):
+    bump_version('user', instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def bump_user_version_on_created(sender, instance, created, **kwargs):
+    # Ids can be reused (e.g. between test runs) while the cache lives on
+    if created:
+        bump_version('user', instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def bump_group_version_on_created(sender, instance, created, **kwargs):
+    if created:
+        bump_version('group', instance.pk)
@@ -1,11 +1,23 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core import mail
+from django.core.management import call_command
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
 
 # Create your tests here.
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
-from .models import Group, UserProfile
+from .invites import send_invites, sweep_expired_invites
+from .memberships import get_memberships, invalidate_memberships, is_group_admin, viewable_group_ids
+from .models import Group, Invite, UserProfile
 
 class TogglePermissionsViewTests(APITestCase):
 
@@ -141,4 +153,205 @@ class RemoveUserFromGroupTests(APITestCase):
         }
         response = self.client.post(self.url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
-        self.assertIn('error', response.data)
\ No newline at end of file
+        self.assertIn('error', response.data)
+
+
+@skipUnless(connection.vendor == 'sqlite', "Query plans are checked against SQLite's EXPLAIN output")
+class UserProfileIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([User(username=f'user{index}') for index in range(100)])
+        groups = Group.objects.bulk_create([Group(name=f'Group {index}') for index in range(10)])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, group=group, can_view=group.pk % 3 != 0)
+            for user in users for group in groups
+        ])
+        cls.user = users[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_viewable_groups_lookup_uses_partial_index(self):
+        plan = UserProfile.objects.filter(
+            user=self.user
+        ).filter(Q(can_view=True) | Q(is_admin=True)).values_list('group', flat=True).explain()
+        self.assertIn('users_profile_viewable_idx', plan)
+
+
+class MembershipCacheTests(APITestCase):
+
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass')
+        self.group = Group.objects.create(name='Test Group')
+        self.hidden_group = Group.objects.create(name='Hidden Group')
+        UserProfile.objects.create(user=self.admin_user, group=self.group, is_admin=True, can_view=False)
+        UserProfile.objects.create(user=self.admin_user, group=self.hidden_group, can_view=False)
+
+        self.request = RequestFactory().get('/')
+        self.request.user = self.admin_user
+
+    def test_memberships_loaded_once_per_request(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(is_group_admin(self.request, self.group.id))
+            self.assertFalse(is_group_admin(self.request, self.hidden_group.id))
+            self.assertEqual(viewable_group_ids(self.request), [self.group.id])
+            self.assertEqual(len(get_memberships(self.request)), 2)
+
+    def test_invalidate_reloads_memberships(self):
+        get_memberships(self.request)
+        UserProfile.objects.filter(group=self.hidden_group).update(can_view=True)
+        self.assertEqual(viewable_group_ids(self.request), [self.group.id])
+
+        invalidate_memberships(self.request)
+        with self.assertNumQueries(1):
+            self.assertEqual(sorted(viewable_group_ids(self.request)), sorted([self.group.id, self.hidden_group.id]))
+
+    def test_permission_and_view_share_one_lookup(self):
+        token = self.client.post('/login/', {'username': 'admin', 'password': 'adminpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        # Token, memberships for IsInGroup, then the group's profiles
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/users/get-groups-users/{self.group.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AsyncUserGroupsCanViewTests(APITestCase):
+
+    def test_matches_sync_view(self):
+        user = User.objects.create_user(username='viewer', password='viewerpass')
+        for index in range(3):
+            group = Group.objects.create(name=f'Group {index}')
+            UserProfile.objects.create(user=user, group=group, can_view=index != 1)
+        token = self.client.post('/login/', {'username': 'viewer', 'password': 'viewerpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+
+        response = self.client.get('/users/async/groups-can-view/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), self.client.get('/users/groups-can-view/').json())
+        self.assertEqual([group['name'] for group in response.json()], ['Group 0', 'Group 2'])
+
+
+class MassInviteTests(APITestCase):
+
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass')
+        self.group = Group.objects.create(name='Test Group')
+        UserProfile.objects.create(user=self.admin_user, group=self.group, is_admin=True)
+
+        token = self.client.post('/login/', {'username': 'admin', 'password': 'adminpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        self.url = f'/users/mass-invite/{self.group.id}/'
+
+    def test_invites_are_sent_to_every_address(self):
+        emails = [f'staff{index}@example.com' for index in range(5)]
+        response = self.client.post(self.url, {'emails': emails}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['sent'], emails)
+        self.assertEqual(response.data['failed'], {})
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), emails)
+
+        for invite in Invite.objects.filter(group=self.group):
+            message = next(message for message in mail.outbox if message.to == [invite.email])
+            self.assertIn(f'token={invite.token}', message.body)
+            self.assertIn(f'token={invite.token}', message.alternatives[0][0])
+
+    def test_failed_address_does_not_undo_the_others(self):
+        send_messages = EmailBackend.send_messages
+
+        def reject_bounce(backend, messages):
+            if messages[0].to == ['bounce@example.com']:
+                raise OSError('Mailbox unavailable')
+            return send_messages(backend, messages)
+
+        emails = ['ok1@example.com', 'bounce@example.com', 'ok2@example.com']
+        with mock.patch.object(EmailBackend, 'send_messages', reject_bounce):
+            response = self.client.post(self.url, {'emails': emails}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['sent'], ['ok1@example.com', 'ok2@example.com'])
+        self.assertEqual(response.data['failed'], {'bounce@example.com': 'Mailbox unavailable'})
+        self.assertEqual(
+            sorted(Invite.objects.values_list('email', flat=True)),
+            ['ok1@example.com', 'ok2@example.com'],
+        )
+
+    def test_existing_members_and_pending_invites_are_skipped(self):
+        member = User.objects.create_user(username='member', password='memberpass', email='Member@example.com')
+        UserProfile.objects.create(user=member, group=self.group)
+        Invite.objects.create(token='pending', group=self.group, email='pending@example.com')
+        expired = Invite.objects.create(token='expired', group=self.group, email='expired@example.com')
+        Invite.objects.filter(pk=expired.pk).update(created_on=timezone.now() - timedelta(days=2))
+
+        emails = ['member@example.com', 'pending@example.com', ' Expired@Example.com', 'expired@example.com', 'new@example.com']
+        response = self.client.post(self.url, {'emails': emails}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['sent'], ['expired@example.com', 'new@example.com'])
+        self.assertEqual(response.data['skipped'], {
+            'member@example.com': 'already a member',
+            'pending@example.com': 'already invited',
+        })
+        self.assertFalse(Invite.objects.filter(pk=expired.pk).exists())
+        self.assertEqual(Invite.objects.filter(group=self.group).count(), 3)
+
+    def test_same_address_can_be_invited_to_several_groups(self):
+        other_group = Group.objects.create(name='Other Group')
+        UserProfile.objects.create(user=self.admin_user, group=other_group, is_admin=True)
+        self.client.post(self.url, {'emails': ['staff@example.com']}, format='json')
+        response = self.client.post(f'/users/mass-invite/{other_group.id}/', {'emails': ['staff@example.com']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Invite.objects.filter(email='staff@example.com').count(), 2)
+
+    def test_query_count_does_not_grow_with_the_list(self):
+        User.objects.create_user(username='staff0', password='staffpass', email='staff0@example.com')
+        emails = [f'staff{index}@example.com' for index in range(40)]
+        # Token, memberships, group, then users, profiles, invites and one insert
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, {'emails': emails}, format='json')
+        self.assertEqual(len(response.data['sent']), 40)
+
+    def test_one_connection_per_batch(self):
+        emails = {f'staff{index}@example.com': f'token{index}' for index in range(7)}
+        with mock.patch.object(EmailBackend, 'open', autospec=True, return_value=True) as opened:
+            results = send_invites(emails, max_workers=2, batch_size=3)
+        self.assertEqual(opened.call_count, 3)
+        self.assertEqual(set(results), set(emails))
+        self.assertFalse(any(results.values()))
+
+
+class InviteSweepTests(APITestCase):
+
+    def setUp(self):
+        self.group = Group.objects.create(name='Test Group')
+        self.user = User.objects.create_user(username='staff@example.com', password='staffpass', email='staff@example.com')
+        for index in range(5):
+            Invite.objects.create(token=f'old{index}', group=self.group, email='staff@example.com')
+        Invite.objects.update(created_on=timezone.now() - timedelta(days=2))
+        self.pending = Invite.objects.create(token='new', group=self.group, email='staff@example.com')
+
+    def test_sweep_removes_only_expired_invites(self):
+        # Two full batches, one partial, then the empty check
+        with self.assertNumQueries(4 + 3):
+            self.assertEqual(sweep_expired_invites(batch_size=2), 5)
+        self.assertEqual(list(Invite.objects.values_list('pk', flat=True)), [self.pending.pk])
+        self.assertEqual(sweep_expired_invites(), 0)
+
+    def test_command_reports_removed_rows(self):
+        out = StringIO()
+        call_command('sweep_expired_invites', '--once', stdout=out)
+        self.assertIn('Removed 5 expired invite(s).', out.getvalue())
+
+    def test_invite_list_hides_expired_invites(self):
+        token = self.client.post('/login/', {'username': 'staff@example.com', 'password': 'staffpass'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        response = self.client.get('/users/invitations/')
+        self.assertEqual([invite['id'] for invite in response.data], [self.pending.pk])
+
+    @skipUnless(connection.vendor == 'sqlite', "Query plans are checked against SQLite's EXPLAIN output")
+    def test_sweep_and_listing_use_indexes(self):
+        self.assertIn('users_invite_created_idx', Invite.objects.expired().values('pk').explain())
+        self.assertIn(
+            'users_invite_email_created_idx',
+            Invite.objects.pending().filter(email='staff@example.com').explain(),
+        )
@@ -1,5 +1,6 @@
 from django.urls import path
 from .views import *
+from .async_views import AsyncUserGroupsCanView
 
 
 app_name = 'users'
@@ -19,6 +20,7 @@ urlpatterns = [
     path('groups/<int:pk>/change-admin/', ChangeGroupAdminView.as_view(), name='change-group-admin'),
     path('toggle-permissions/', TogglePermissionsView.as_view(), name='toggle-permissions'),
     path('groups-can-view/', UserGroupsCanView.as_view(), name="groups-can-view"),
+    path('async/groups-can-view/', AsyncUserGroupsCanView.as_view(), name='async-groups-can-view'),
 
     ## Invitations
     path('invitations/', InviteListView.as_view(), name='invite-list'),
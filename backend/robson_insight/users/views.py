@@ -2,9 +2,6 @@ from django.contrib.auth.models import User
 from django.db.utils import IntegrityError
 from django.db import transaction
 from django.core.exceptions import ValidationError
-from django.core.signing import Signer
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
 
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
@@ -12,9 +9,10 @@ from rest_framework.authtoken.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import APIException
 
-from robson_insight import settings
 from .serializers import *
 from .models import UserProfile, Group, Invite
+from .invites import build_invite_message, create_invites, invite_token, send_invites
+from .memberships import get_membership, get_memberships, invalidate_memberships, is_group_admin, member_group_ids
 from .permissions import IsInGroup, IsGroupAdmin
 
 class UserProfileListView(generics.ListAPIView):
@@ -74,7 +72,7 @@ class GroupListCreateView(generics.ListCreateAPIView):
     serializer_class = GroupSerializer
 
     def get_queryset(self):
-        return Group.objects.filter(userprofile__user=self.request.user)
+        return Group.objects.filter(pk__in=member_group_ids(self.request))
 
     def perform_create(self, serializer):
         group = serializer.save()
@@ -84,6 +82,7 @@ class GroupListCreateView(generics.ListCreateAPIView):
             group=group,
             is_admin=True
         )
+        invalidate_memberships(self.request)
 
 class CreateGroup(APIView):
     permission_classes = [IsAuthenticated]
@@ -136,7 +135,7 @@ class UserProfileInGroupListView(generics.ListAPIView):
 
     def get_queryset(self):
         group_pk = self.kwargs.get('group_pk')
-        queryset = UserProfile.objects.filter(group=group_pk)
+        queryset = UserProfile.objects.filter(group=group_pk).select_related('user')
         return queryset
     
 
@@ -153,11 +152,11 @@ class AddUserToGroupView(APIView):
             user = User.objects.get(username__iexact=username)
             group = Group.objects.get(id=group_id)
 
-            requesting_user_admin = UserProfile.objects.get(user=request.user, group=group).is_admin
-            if not requesting_user_admin:
+            if not is_group_admin(request, group.pk):
                 return Response({'error': 'You are not authorized to add users to this group.'}, status=status.HTTP_403_FORBIDDEN)
 
             user_profile, created = UserProfile.objects.get_or_create(user=user, group=group)
+            invalidate_memberships(request)
             if created:
                 return Response({'success': f'User {user.username} was added to group {group.name}'}, status=status.HTTP_201_CREATED)
             else:
@@ -186,10 +185,9 @@ class RemoveUserFromGroup(APIView):
             user = User.objects.get(username=username)
             group = Group.objects.get(id=group_id)
             user_profile = UserProfile.objects.get(user=user, group=group)
-            num_user_profiles = UserProfile.objects.filter(user=request.user).count()
+            num_user_profiles = len(get_memberships(request))
 
-            requesting_user_admin = UserProfile.objects.get(user=request.user, group=group).is_admin
-            if not requesting_user_admin:
+            if not is_group_admin(request, group.pk):
                 return Response({'error': 'You are not authorized to remove users from this group.'}, status=status.HTTP_403_FORBIDDEN)
             
             if num_user_profiles <= 1:
@@ -327,6 +325,7 @@ class ChangeGroupAdminView(APIView):
 
                 new_admin_profile.is_admin = True
                 new_admin_profile.save()
+            invalidate_memberships(request)
         except ValidationError as e:
             return Response(
                 {'error': str(e)},
@@ -349,32 +348,11 @@ class InviteCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         group = Group.objects.get(pk=self.kwargs['group_pk'])
         email = serializer.validated_data['email']
-        signer = Signer()
-        token = signer.sign(email)
-        token = token.split(':')[1]
+        token = invite_token(email, group.pk)
         invite = serializer.save(token=token, group=group, email=email)
         
-        invite_url = f"http://localhost:8081/signup?token={token}"
-        
-        if not User.objects.filter(email=email).exists():
-            subject = 'Robson Insights Invitation'
-            context = {'invite_url': invite_url}
-            html_content = render_to_string('email_invite.html', context)
-        else:
-            subject = 'Robson Insights Invitation'
-            context = {'invite_url': invite_url}
-            html_content = render_to_string('email_invite.html', context)
-
         try:
-            # Set up the email with HTML content
-            email_msg = EmailMultiAlternatives(
-                subject=subject,
-                body=invite_url,  # Fallback text for email clients that don't support HTML
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[email],
-            )
-            email_msg.attach_alternative(html_content, "text/html")
-            email_msg.send(fail_silently=False)
+            build_invite_message(email, token).send(fail_silently=False)
         except Exception as e:
             # If email sending fails, delete the created invite and re-raise the exception
             invite.delete()
@@ -391,42 +369,30 @@ class MassInviteCreateView(APIView):
         if serializer.is_valid():
             emails = serializer.validated_data['emails']
             group = Group.objects.get(pk=group_pk)
-            signer = Signer()
-            created_invites = []
-
-            try:
-                for email in emails:
-                    token = signer.sign(email).split(':')[1]
-                    invite = Invite.objects.create(token=token, group=group, email=email)
-                    created_invites.append(invite)
-                    
-                    invite_url = f"http://localhost:8081/signup?token={token}"
-                    subject = 'Robson Insights Invitation'
-                    context = {'invite_url': invite_url}
-                    html_content = render_to_string('email_invite.html', context)
-                    
-                    # Use EmailMultiAlternatives to send HTML email
-                    email_msg = EmailMultiAlternatives(
-                        subject=subject,
-                        body=invite_url,  # Fallback text for email clients that don’t support HTML
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to=[email],
-                    )
-                    email_msg.attach_alternative(html_content, "text/html")
-                    email_msg.send(fail_silently=False)
-                
-                return Response(
-                    {'success': f'Invitations sent to {len(emails)} users.'},
-                    status=status.HTTP_201_CREATED
-                )
-            except Exception as e:
-                # Roll back invites if an error occurs
-                for invite in created_invites:
-                    invite.delete()
+            invites, skipped = create_invites(group, emails)
+
+            # Mail is sent after the invites are saved and outside any
+            # transaction; only the invites that could not be delivered are removed.
+            results = send_invites({email: invite.token for email, invite in invites.items()})
+            failed = {email: error for email, error in results.items() if error}
+            if failed:
+                Invite.objects.filter(pk__in=[invites[email].pk for email in failed]).delete()
+
+            sent = [email for email in invites if results.get(email) is None]
+            if invites and not sent:
                 return Response(
-                    {'error': f"Failed to send invitation emails: {str(e)}"},
+                    {'error': 'Failed to send invitation emails.', 'failed': failed, 'skipped': skipped},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
+            return Response(
+                {
+                    'success': f'Invitations sent to {len(sent)} users.',
+                    'sent': sent,
+                    'failed': failed,
+                    'skipped': skipped,
+                },
+                status=status.HTTP_201_CREATED
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         
@@ -484,8 +450,9 @@ class TogglePermissionsView(APIView):
 
         try:
             group = Group.objects.get(id=group_id)
-            current_admin_profile = UserProfile.objects.get(user=request.user,group=group)
-            if not current_admin_profile.is_admin:
+            if get_membership(request, group.pk) is None:
+                return Response({"error": "User profile not found in this group."}, status=status.HTTP_404_NOT_FOUND)
+            if not is_group_admin(request, group.pk):
                 return Response({"error": "You are not authorized to toggle permissions."}, status=status.HTTP_403_FORBIDDEN)
 
             target_user = User.objects.get(username=username)
@@ -494,6 +461,7 @@ class TogglePermissionsView(APIView):
             target_user_profile.can_view = toggle_view
 
             target_user_profile.save()
+            invalidate_memberships(request)
 
             return Response({"success": f"Permissions updated for {target_user.username}."}, status=status.HTTP_200_OK)
 
@@ -512,16 +480,17 @@ class InviteListView(generics.ListAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        return Invite.objects.filter(email=user)
+        return Invite.objects.pending().filter(email=user).select_related('group')
         
 class UserGroupsCanView(generics.ListAPIView):
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        user_profile = UserProfile.objects.filter(user=user, can_view=True)
+        group_ids = [
+            group_id for group_id, membership in get_memberships(self.request).items() if membership.can_view
+        ]
         
-        if user_profile.exists():
-            return Group.objects.filter(userprofile__in=user_profile)
+        if group_ids:
+            return Group.objects.filter(pk__in=group_ids)
         return Group.objects.none()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   ScrollView,
@@ -65,6 +65,9 @@ const ResultsScreen = ({ navigation }) => {
   const [hasPermission, setHasPermission] = useState(false);
   const [currentFilterName, setCurrentFilterName] = useState('');
 
+  // Sync token and entries per group/filter, so returning to one only downloads what changed
+  const syncedEntries = useRef({});
+
   const toast = useToastController();
   const currentToast = useToastState();
 
@@ -154,14 +157,16 @@ const ResultsScreen = ({ navigation }) => {
 
       results.forEach((result) => {
         const { classification, csection } = result;
+        // Uploaded sheets store one weighted entry per cell
+        const count = result.count ?? 1;
         if (!categoryData[classification]) {
           // If the classification is not in classificationOrder, you might want to handle it
           // For now, we'll skip it
           return;
         }
-        categoryData[classification].responses += 1;
+        categoryData[classification].responses += count;
         if (csection) {
-          categoryData[classification].csectionCount += 1;
+          categoryData[classification].csectionCount += count;
         }
       });
 
@@ -238,9 +243,33 @@ const ResultsScreen = ({ navigation }) => {
   };
 
 
+  const syncEntries = async (scope) => {
+    const cached = syncedEntries.current[scope] || { token: null, entries: new Map() };
+    let { token, entries } = cached;
+    let hasMore = true;
+
+    while (hasMore) {
+      const response = await axiosInstance.get(`/survey/entries/sync/${scope}/`, {
+        headers: { Authorization: `Token ${user.token}` },
+        params: token ? { token } : {}
+      });
+      const { data } = response;
+      if (data.reset) {
+        entries = new Map();
+      }
+      data.entries.forEach(entry => entries.set(entry.id, entry));
+      data.deleted.forEach(id => entries.delete(id));
+      token = data.token;
+      hasMore = data.has_more;
+    }
+
+    syncedEntries.current[scope] = { token, entries };
+    return Array.from(entries.values()).sort((a, b) => a.id - b.id);
+  };
+
   const fetchResults = async () => {
     const prefix = selectedType === 'group' ? 'group-' : 'filter-';
-    const endpoint = `/survey/entries/filter/${prefix}${selectedId}/`;
+    const scope = `${prefix}${selectedId}`;
     if (selectedType === 'group') {
       const selectedGroup = groups.find(g => g.id === selectedId);
       if (selectedGroup) {
@@ -254,11 +283,9 @@ const ResultsScreen = ({ navigation }) => {
     }
 
     try {
-      const response = await axiosInstance.get(endpoint, {
-        headers: { Authorization: `Token ${user.token}` }
-      });
-      setResults(response.data);
-      setAllResults(response.data);
+      const entries = await syncEntries(scope);
+      setResults(entries);
+      setAllResults(entries);
     } catch (error) {
       console.error(`Error fetching entries for ${selectedType}:`, error);
       toast.show('Error', {
@@ -625,10 +652,10 @@ const ResultsScreen = ({ navigation }) => {
         }
       );
       setErrorMessaageEmail('');
-      setSuccessMessageEmail('Sent!');
+      setSuccessMessageEmail('Export queued — it will arrive by email shortly.');
     } catch (error) {
       setSuccessMessageEmail('');
-      setErrorMessaageEmail('Email failed to send.');
+      setErrorMessaageEmail('Could not queue the export.');
       console.error('Error sending email:', error);
     }
   };